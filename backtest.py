@@ -0,0 +1,241 @@
+"""Historical rolling-window backtest over local daily price files.
+
+One file per series goes in data/prices: ``qqq.csv`` and ``streakbull.csv``
+(or ``.npy``). CSV files need a ``date`` column and either ``close`` (prices)
+or ``return`` (daily simple returns). The first load writes a binary
+``.npy`` copy next to the CSV, and later loads memory-map it instead of
+parsing text. No price history ships with the repo.
+
+Every trading day with a full horizon of history after it is an entry date.
+All windows are evaluated at once: units bought by each deposit come from
+per-residue cumulative sums of inverse prices, so a window's value on any
+day is a difference of two cumulative sums times that day's price.
+"""
+import csv
+import os
+
+import numpy as np
+
+from drawdown import drawdown_analytics
+from fee_engine import DEFAULT_SCHEDULE, apply_performance_fees
+from monte_carlo import CHUNK_ELEMENTS, PERCENTILES, TRADING_DAYS
+
+PRICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prices')
+PRICE_DTYPE = np.dtype([('date', 'datetime64[D]'), ('price', 'f8')])
+
+# Price file and daily leverage behind each scenario (1X QQQ, 1X and 2X StreakBull)
+BACKTEST_SERIES = {
+    'pessimistic': ('qqq', 1),
+    'moderate': ('streakbull', 1),
+    'optimistic': ('streakbull', 2)
+}
+
+# Trading days between deposits of each savings frequency
+TRADING_DAYS_PER_PERIOD = {
+    'Semanal': 5,
+    'Mensual': 21,
+    'Trimestral': 63
+}
+
+
+def _read_csv(path):
+    """Parse a date/close or date/return CSV into a date-sorted PRICE_DTYPE array"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fields = [name.strip().lower() for name in reader.fieldnames or ()]
+        columns = {name: [] for name in fields}
+        for row in reader:
+            for name, value in zip(fields, row.values()):
+                columns[name].append(value)
+
+    if 'date' not in columns or not ({'close', 'return'} & set(columns)):
+        raise ValueError(f"{path}: needs a 'date' column and a 'close' or 'return' column")
+    dates = np.array(columns['date'], dtype='datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    if 'close' in columns:
+        prices = np.array(columns['close'], dtype=float)[order]
+    else:
+        prices = np.cumprod(1 + np.array(columns['return'], dtype=float)[order])
+
+    series = np.empty(dates.size, dtype=PRICE_DTYPE)
+    series['date'] = dates[order]
+    series['price'] = prices
+    return series
+
+
+def price_files(name, directory=PRICE_DIR):
+    """Paths of a series' CSV and binary copy"""
+    base = os.path.join(directory, name)
+    return base + '.csv', base + '.npy'
+
+
+def backtest_available(series=BACKTEST_SERIES, directory=PRICE_DIR):
+    """Whether every price file needed by the scenarios is present"""
+    return all(any(map(os.path.exists, price_files(name, directory))) for name, _ in series.values())
+
+
+def data_version(series=BACKTEST_SERIES, directory=PRICE_DIR):
+    """Modification times of the price files, for cache keys"""
+    return tuple(
+        os.path.getmtime(path)
+        for name in sorted({name for name, _ in series.values()})
+        for path in price_files(name, directory) if os.path.exists(path)
+    )
+
+
+def load_prices(name, directory=PRICE_DIR):
+    """Memory-mapped PRICE_DTYPE array of a series, converting a newer CSV to .npy first"""
+    csv_path, npy_path = price_files(name, directory)
+    if os.path.exists(csv_path) and (not os.path.exists(npy_path)
+                                     or os.path.getmtime(csv_path) > os.path.getmtime(npy_path)):
+        series = _read_csv(csv_path)
+        try:
+            np.save(npy_path, series)
+        except OSError:
+            # Read-only data directory: parse the CSV on every load
+            return series
+    if not os.path.exists(npy_path):
+        raise FileNotFoundError(f"no price file for '{name}' in {directory} (expected {name}.csv or {name}.npy)")
+    return np.load(npy_path, mmap_mode='r')
+
+
+def leveraged(prices, leverage=1):
+    """Price index of a daily-rebalanced position at ``leverage`` times the daily returns"""
+    prices = np.asarray(prices, dtype=float)
+    if leverage == 1:
+        return prices
+    growth = 1 + leverage * (prices[1:] / prices[:-1] - 1)
+    return prices[0] * np.concatenate(([1.0], np.cumprod(growth)))
+
+
+def align(series):
+    """Common trading dates of several PRICE_DTYPE arrays and their prices on them, shape (series, dates)"""
+    dates = series[0]['date']
+    for other in series[1:]:
+        dates = np.intersect1d(dates, other['date'], assume_unique=True)
+    prices = np.array([s['price'][np.searchsorted(s['date'], dates)] for s in series])
+    return dates, prices
+
+
+def _residue_sums(prices, step):
+    """Running sums of 1/prices over the days ``step`` apart: sums[t] = 1/prices[t] + sums[t - step]"""
+    m = -(-prices.size // step)
+    inverse = np.zeros(m * step)
+    inverse[:prices.size] = 1 / prices
+    return np.cumsum(inverse.reshape(m, step), axis=0).ravel()[:prices.size]
+
+
+def window_values(prices, sums, starts, offsets, initial_capital, periodic_savings, step):
+    """Value of every (entry day, day since entry) window; shape (len(starts), len(offsets)).
+
+    The initial capital buys units on the entry day and each saving buys
+    units every ``step`` trading days after it, so the units saved by day
+    ``offset`` are the residue sums at the last deposit minus those at entry.
+    """
+    starts = np.asarray(starts)
+    offsets = np.asarray(offsets)
+    last_deposit = starts[:, None] + (offsets - offsets % step)
+    units = sums[last_deposit]
+    units -= sums[starts, None]
+    units *= periodic_savings
+    units += initial_capital / prices[starts, None]
+    units *= prices[starts[:, None] + offsets]
+    return units
+
+
+def rolling_backtest(dates, prices, initial_capital, periodic_savings, periods, savings_frequency,
+                     lock_period=6, fee_schedule=DEFAULT_SCHEDULE, names=tuple(BACKTEST_SERIES),
+                     percentiles=PERCENTILES):
+    """Outcomes of the savings plan for every historical entry date, per price series.
+
+    ``prices`` has one row per name. The horizon is ``periods`` savings
+    periods of trading days. Returns the 'start_dates' and 'end_dates' of
+    the windows, the 'offsets' (trading days since entry) and 'deposits'
+    along a window, and per name the 'final_value', 'return_pct',
+    'fee_rate', 'net_final_value' and 'max_drawdown' of every window plus
+    'percentiles' bands across windows at every offset, as in
+    run_monte_carlo.
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    step = TRADING_DAYS_PER_PERIOD.get(savings_frequency, 5)
+    horizon = periods * step
+    n_windows = prices.shape[1] - horizon
+    if n_windows < 1:
+        raise ValueError(f"{prices.shape[1]} trading days of history are not enough for a {horizon}-day horizon")
+
+    starts = np.arange(n_windows)
+    offsets = np.arange(horizon + 1)
+    deposits = initial_capital + periodic_savings * (offsets // step)
+    results = {
+        'start_dates': np.asarray(dates)[starts],
+        'end_dates': np.asarray(dates)[starts + horizon],
+        'offsets': offsets,
+        'deposits': deposits,
+        'n_windows': n_windows
+    }
+
+    # Chunks bound the (windows x days) matrices regardless of history and horizon
+    rows = max(CHUNK_ELEMENTS // offsets.size, 1)
+    columns = max(CHUNK_ELEMENTS // n_windows, 1)
+    for name, series in zip(names, prices):
+        sums = _residue_sums(series, step)
+        final_value = window_values(series, sums, starts, [horizon], initial_capital, periodic_savings, step)[:, 0]
+        net_final_value, fee_rate = apply_performance_fees(final_value, deposits[-1], lock_period, fee_schedule)
+
+        max_drawdown = np.concatenate([
+            drawdown_analytics(
+                window_values(series, sums, starts[i:i + rows], offsets, initial_capital, periodic_savings, step),
+                TRADING_DAYS
+            )['max_drawdown']
+            for i in range(0, n_windows, rows)
+        ])
+        bands = np.concatenate([
+            np.percentile(
+                window_values(series, sums, starts, offsets[j:j + columns], initial_capital, periodic_savings, step),
+                percentiles,
+                axis=0
+            )
+            for j in range(0, offsets.size, columns)
+        ], axis=1)
+
+        results[name] = {
+            'final_value': final_value,
+            'return_pct': (final_value / deposits[-1] - 1) * 100,
+            'fee_rate': fee_rate,
+            'net_final_value': net_final_value,
+            'max_drawdown': max_drawdown,
+            'percentiles': dict(zip(percentiles, bands)),
+            'n_paths': n_windows
+        }
+    return results
+
+
+def run_backtest(initial_capital, periodic_savings, periods, savings_frequency, lock_period=6,
+                 fee_schedule=DEFAULT_SCHEDULE, series=BACKTEST_SERIES, directory=PRICE_DIR):
+    """Load, lever and align the scenario price files, then run rolling_backtest over them"""
+    loaded = {name: load_prices(name, directory) for name in {name for name, _ in series.values()}}
+    dates, prices = align(list(loaded.values()))
+    rows = dict(zip(loaded, prices))
+    return rolling_backtest(
+        dates,
+        [leveraged(rows[name], leverage) for name, leverage in series.values()],
+        initial_capital,
+        periodic_savings,
+        periods,
+        savings_frequency,
+        lock_period,
+        fee_schedule,
+        names=tuple(series)
+    )
+
+
+def backtest_summary(results, names=tuple(BACKTEST_SERIES)):
+    """Distribution across entry dates per scenario: final value, return and drawdown percentiles"""
+    summary = {'scenario': list(names)}
+    for field in ('final_value', 'net_final_value', 'return_pct', 'max_drawdown'):
+        for q in (5, 50, 95):
+            summary[f'{field}_p{q}'] = np.array([np.percentile(results[name][field], q) for name in names])
+    summary['prob_below_deposits'] = np.array([
+        np.mean(results[name]['final_value'] < results['deposits'][-1]) for name in names
+    ])
+    return summary
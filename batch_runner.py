@@ -0,0 +1,253 @@
+"""Headless batch illustrations: client parameter rows in, per-client results and a summary out.
+
+    python batch_runner.py clients.csv --output-dir illustrations --preset streakbull --workers 8
+
+The input CSV has one row per client with the columns ``client_id``,
+``initial_capital``, ``periodic_savings``, ``periods``, ``lock_period``,
+``savings_frequency`` (Semanal, Mensual or Trimestral) and optionally
+``include_savings`` and ``target_value``; ``lock_period`` must be a lock of
+the preset's fee table (6 or 12 months for streakbull). Rows with a target
+also get the value of ``--solve-for`` (periodic savings by default) that
+reaches it net of fees in each scenario. ``--lots`` adds the per-deposit lot ledger totals:
+liquid and locked balances and the fees paid and accrued over every lot.
+Only NumPy-level modules are imported, never streamlit or plotly.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from exporters import write_csv
+from fee_engine import FEE_TABLE
+from goal_seek import SOLVABLE, solve_goal
+from lot_ledger import ledger_totals
+from scenario_engine import SCENARIO_PRESETS, WEEKS_PER_PERIOD, evaluate_rows, simulate_paths, to_weeks, lock_weeks, cumulative_deposits
+
+# Clients evaluated per task sent to a worker
+BATCH_ROWS = 5_000
+
+INPUT_COLUMNS = ('client_id', 'initial_capital', 'periodic_savings', 'periods', 'lock_period', 'savings_frequency')
+SUMMARY_PERCENTILES = (5, 50, 95)
+
+
+def _flag(text):
+    return text.strip().lower() not in ('0', 'false', 'no', 'n', '')
+
+
+def read_clients(path, preset='streakbull'):
+    """Read the client CSV into column arrays, checking each row against the preset's fee table"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = [col for col in INPUT_COLUMNS if col not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+        rows = list(reader)
+
+    clients = {
+        'client_id': np.array([row['client_id'] for row in rows]),
+        'initial_capital': np.array([float(row['initial_capital']) for row in rows]),
+        'periodic_savings': np.array([float(row['periodic_savings']) for row in rows]),
+        'periods': np.array([int(row['periods']) for row in rows]),
+        'lock_period': np.array([int(row['lock_period']) for row in rows]),
+        'savings_frequency': np.array([row['savings_frequency'].strip() for row in rows]),
+        'include_savings': np.array([_flag(row.get('include_savings') or '1') for row in rows]),
+        'target_value': np.array([float((row.get('target_value') or 'nan').strip() or 'nan') for row in rows])
+    }
+
+    # Fee schedules without per-lock tiers (legacy) take any lock
+    locks = FEE_TABLE[SCENARIO_PRESETS[preset]['fee_schedule']]
+    checks = (
+        ('periods', clients['periods'] >= 1, "at least 1"),
+        ('savings_frequency', np.isin(clients['savings_frequency'], list(WEEKS_PER_PERIOD)),
+         f"one of {', '.join(WEEKS_PER_PERIOD)}"),
+        ('lock_period', clients['lock_period'] >= 0 if None in locks else np.isin(clients['lock_period'], list(locks)),
+         "at least 0" if None in locks else f"one of {', '.join(map(str, sorted(locks)))} for the {preset} preset")
+    )
+    for column, valid, expected in checks:
+        if not valid.all():
+            i = np.flatnonzero(~valid)[0]
+            raise ValueError(f"{path}: client {clients['client_id'][i]}: {column} must be {expected}, "
+                             f"got {clients[column][i].item()!r}")
+    return clients
+
+
+def _path_file_name(client_id):
+    """File name of a client's weekly paths; IDs that would leave the paths directory are rejected"""
+    if client_id in ('', '.', '..') or '/' in client_id or '\\' in client_id:
+        raise ValueError(f"client_id {str(client_id)!r} cannot be used as a file name")
+    return f'{client_id}.csv'
+
+
+def _slice(clients, start, stop):
+    return {name: values[start:stop] for name, values in clients.items()}
+
+
+def evaluate_batch(clients, preset, paths_dir=None, solve_for='periodic_savings', lots=False):
+    """Per-client result columns for one batch, optionally writing each client's weekly paths"""
+    config = SCENARIO_PRESETS[preset]
+    rates = config['rates']
+    savings = np.where(clients['include_savings'], clients['periodic_savings'], 0.0)
+    result = evaluate_rows(
+        clients['initial_capital'],
+        savings,
+        clients['periods'],
+        clients['lock_period'],
+        clients['savings_frequency'],
+        list(rates.values()),
+        lock_delays_returns=config['lock_delays_returns'],
+        fee_schedule=config['fee_schedule']
+    )
+
+    columns = {
+        'client_id': clients['client_id'],
+        'weeks': result['weeks'],
+        'deposits': result['deposits']
+    }
+    for i, name in enumerate(rates):
+        columns[f'{name}_final_value'] = result['final_value'][i]
+        columns[f'{name}_return_pct'] = result['return_pct'][i]
+        columns[f'{name}_fee_rate'] = result['fee_rate'][i]
+        columns[f'{name}_net_final_value'] = result['net_final_value'][i]
+
+    # Goal seek for the rows with a target; the required rate does not depend on the scenario
+    has_target = ~np.isnan(clients['target_value'])
+    if has_target.any():
+        goal_inputs = dict(
+            initial_capital=clients['initial_capital'],
+            periodic_savings=savings,
+            periods=clients['periods'],
+            lock_period=clients['lock_period'],
+            savings_frequency=clients['savings_frequency'],
+            lock_delays_returns=config['lock_delays_returns'],
+            fee_schedule=config['fee_schedule']
+        )
+        if solve_for == 'annual_rate':
+            scenario_rates = {'required': 0.0}
+        else:
+            scenario_rates = {f'{name}_required': rate for name, rate in rates.items()}
+        for prefix, rate in scenario_rates.items():
+            solved = solve_goal(clients['target_value'], solve_for, annual_rate=rate, **goal_inputs)['value']
+            columns[f'{prefix}_{solve_for}'] = np.where(has_target, solved, np.nan)
+
+    if lots:
+        ledger = ledger_totals(
+            clients['initial_capital'],
+            savings,
+            clients['periods'],
+            clients['lock_period'],
+            clients['savings_frequency'],
+            list(rates.values()),
+            config['lock_delays_returns'],
+            config['fee_schedule']
+        )
+        columns['lots'] = ledger['lots']
+        for i, name in enumerate(rates):
+            columns[f'{name}_liquid'] = ledger['liquid'][i]
+            columns[f'{name}_locked'] = ledger['locked'][i]
+            columns[f'{name}_lot_fees_paid'] = ledger['fees_paid'][i]
+            columns[f'{name}_lot_accrued_fee'] = ledger['accrued_fee'][i]
+            columns[f'{name}_lot_net_value'] = ledger['net_value'][i]
+
+    if paths_dir is not None:
+        for i, client_id in enumerate(clients['client_id']):
+            weeks, savings_weekly = to_weeks(clients['periods'][i], savings[i], clients['savings_frequency'][i])
+            lock = lock_weeks(clients['lock_period'][i]) if config['lock_delays_returns'] else 0
+            paths = simulate_paths(clients['initial_capital'][i], savings_weekly, weeks, list(rates.values()), lock)
+            path_columns = {
+                'week': np.arange(weeks),
+                'deposits': cumulative_deposits(clients['initial_capital'][i], savings_weekly, weeks)
+            }
+            path_columns.update(zip(rates, paths))
+            write_csv(os.path.join(paths_dir, _path_file_name(client_id)), path_columns)
+    return columns
+
+
+def summarize(columns, preset):
+    """Book-level totals and return percentiles per scenario"""
+    summary = {'scenario': [], 'clients': [], 'total_deposits': [], 'total_final_value': [],
+               'total_fees': [], 'total_net_final_value': []}
+    for p in SUMMARY_PERCENTILES:
+        summary[f'return_pct_p{p}'] = []
+
+    n = len(columns['client_id'])
+    for name in SCENARIO_PRESETS[preset]['rates']:
+        final_value = columns[f'{name}_final_value']
+        net = columns[f'{name}_net_final_value']
+        summary['scenario'].append(name)
+        summary['clients'].append(n)
+        summary['total_deposits'].append(float(columns['deposits'].sum()))
+        summary['total_final_value'].append(float(final_value.sum()))
+        summary['total_fees'].append(float((final_value - net).sum()))
+        summary['total_net_final_value'].append(float(net.sum()))
+        returns = np.percentile(columns[f'{name}_return_pct'], SUMMARY_PERCENTILES) if n else [np.nan] * 3
+        for p, value in zip(SUMMARY_PERCENTILES, returns):
+            summary[f'return_pct_p{p}'].append(float(value))
+    return {name: np.asarray(values) for name, values in summary.items()}
+
+
+def run_batch(clients, preset='streakbull', workers=None, paths_dir=None, batch_rows=BATCH_ROWS,
+              solve_for='periodic_savings', lots=False):
+    """Evaluate every client in batches over a process pool; results keep the input order"""
+    n = len(clients['client_id'])
+    bounds = [(start, min(start + batch_rows, n)) for start in range(0, n, batch_rows)]
+    batches = [_slice(clients, start, stop) for start, stop in bounds]
+    workers = min(workers or os.cpu_count() or 1, max(len(batches), 1))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            parts = list(executor.map(evaluate_batch, batches, [preset] * len(batches), [paths_dir] * len(batches),
+                                      [solve_for] * len(batches), [lots] * len(batches)))
+    else:
+        parts = [evaluate_batch(batch, preset, paths_dir, solve_for, lots) for batch in batches]
+
+    if not parts:
+        parts = [evaluate_batch(_slice(clients, 0, 0), preset, lots=lots)]
+    # Batches without targets lack the goal-seek columns
+    names = list(dict.fromkeys(name for part in parts for name in part))
+    n_rows = [len(part['client_id']) for part in parts]
+    return {
+        name: np.concatenate([part.get(name, np.full(rows, np.nan)) for part, rows in zip(parts, n_rows)])
+        for name in names
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run scenario illustrations for a CSV of clients without the UI")
+    parser.add_argument('clients', help="Client parameter CSV")
+    parser.add_argument('--output-dir', default='illustrations', help="Directory for results.csv and summary.csv")
+    parser.add_argument('--preset', choices=sorted(SCENARIO_PRESETS), default='streakbull',
+                        help="Scenario rates and fee rules: 'streakbull' (simulator1.0.py) or 'legacy' (simulator.py)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all CPUs)")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help="Clients per worker task")
+    parser.add_argument('--solve-for', choices=SOLVABLE, default='periodic_savings',
+                        help="Input solved for rows with a target_value (default %(default)s)")
+    parser.add_argument('--lots', action='store_true', help="Also report the per-deposit lot ledger totals")
+    parser.add_argument('--paths', action='store_true', help="Also write each client's weekly paths to paths/<client_id>.csv")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    clients = read_clients(args.clients, args.preset)
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths_dir = None
+    if args.paths:
+        for client_id in clients['client_id']:
+            _path_file_name(client_id)
+        paths_dir = os.path.join(args.output_dir, 'paths')
+        os.makedirs(paths_dir, exist_ok=True)
+
+    columns = run_batch(clients, args.preset, args.workers, paths_dir, args.batch_rows, args.solve_for, args.lots)
+    write_csv(os.path.join(args.output_dir, 'results.csv'), columns)
+    write_csv(os.path.join(args.output_dir, 'summary.csv'), summarize(columns, args.preset))
+
+    print(f"{len(columns['client_id'])} clients illustrated in {time.perf_counter() - started:.1f}s "
+          f"-> {args.output_dir}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Benchmark suite for the simulators' hot paths.
+
+    python benchmarks.py --save          # record baselines for this machine
+    python benchmarks.py                 # compare against them; exit 1 on regression
+    python benchmarks.py --quick -k cohort --threshold 0.5
+
+Every case runs across increasing horizon lengths, investor counts or path
+counts. After one warm-up run it records the best wall time of ``--repeat``
+runs and the peak traced memory of one more run. A case regresses when time
+or memory grows by more than ``--threshold`` (a fraction) over the saved
+baseline. Baselines are machine specific, so save them on the machine that
+runs the comparison.
+
+Each headless module (the NumPy core, batch runner and compute service) is
+also imported cold in a fresh interpreter. It must stay within
+``--import-budget`` seconds and must never load streamlit, pandas, plotly,
+xlsxwriter or pyarrow.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmark_baselines.json')
+THRESHOLD = float(os.environ.get('STREAKBULL_BENCH_THRESHOLD', 0.25))
+
+# Differences below these are timer or allocator noise, never regressions
+MIN_SECONDS = 0.005
+MIN_BYTES = 1 * 2 ** 20
+
+# Cold import budget for the headless modules used by batch jobs and compute workers
+IMPORT_BUDGET = float(os.environ.get('STREAKBULL_IMPORT_BUDGET', 0.5))
+HEADLESS_MODULES = ('scenario_engine', 'fee_engine', 'drawdown', 'monte_carlo', 'backtest', 'stress_test', 'goal_seek',
+                    'lot_ledger', 'cohort_engine', 'charts', 'exporters', 'result_cache', 'batch_runner', 'compute_service')
+UI_MODULES = ('streamlit', 'pandas', 'plotly', 'xlsxwriter', 'pyarrow')
+
+
+def _load(filename):
+    """Import a Streamlit script by path (simulator1.0.py is not a valid module name)"""
+    name = os.path.splitext(filename)[0].replace('.', '_')
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(BASE_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+    return sys.modules[name]
+
+
+def _scenario_inputs(weeks):
+    return dict(initial_capital=10000, periodic_savings=250, periods=weeks, lock_period=6, savings_frequency='Semanal')
+
+
+def bench_scenarios(weeks):
+    simulator = _load('simulator1.0.py')
+    inputs = _scenario_inputs(weeks)
+    return lambda: simulator.calculate_investment_scenarios(include_savings=True, **inputs)
+
+
+def bench_scenarios_daily(weeks):
+    simulator = _load('simulator1.0.py')
+    inputs = _scenario_inputs(weeks)
+    return lambda: simulator.calculate_investment_scenarios(include_savings=True, resolution='D', **inputs)
+
+
+def bench_scenarios_legacy(weeks):
+    simulator = _load('simulator.py')
+    inputs = _scenario_inputs(weeks)
+    return lambda: simulator.calculate_investment_scenarios(**inputs)
+
+
+def bench_drawdown(weeks):
+    from drawdown import drawdown_analytics
+    from scenario_engine import simulate_paths
+
+    paths = simulate_paths(10000, 250, weeks, [0.1857, 0.2950, 0.6500])
+    return lambda: drawdown_analytics(paths)
+
+
+def bench_monte_carlo(n_paths):
+    from monte_carlo import run_monte_carlo
+
+    return lambda: run_monte_carlo(10000, 250, 260, 0.2950, n_paths, seed=1, workers=1)
+
+
+def bench_stress(weeks):
+    from stress_test import stress_results
+
+    return lambda: stress_results(**_scenario_inputs(weeks))
+
+
+def bench_goal_seek(rows):
+    import numpy as np
+    from goal_seek import solve_goal
+
+    rng = np.random.default_rng(1)
+    clients = dict(
+        initial_capital=rng.uniform(1000, 50000, rows),
+        periodic_savings=rng.uniform(0, 1000, rows),
+        periods=rng.integers(10, 260, rows),
+        lock_period=rng.choice([6, 12], rows),
+        savings_frequency='Semanal',
+        annual_rate=0.2950
+    )
+    targets = clients['initial_capital'] * 3
+    return lambda: [solve_goal(targets, unknown, **clients) for unknown in ('periodic_savings', 'periods')]
+
+
+def bench_lot_ledger(rows):
+    import numpy as np
+    from lot_ledger import ledger_totals
+
+    rng = np.random.default_rng(1)
+    capital = rng.uniform(1000, 50000, rows)
+    savings = rng.uniform(0, 1000, rows)
+    periods = rng.integers(10, 260, rows)
+    lock = rng.choice([6, 12], rows)
+    return lambda: ledger_totals(capital, savings, periods, lock, 'Semanal', [0.1857, 0.2950, 0.6500])
+
+
+def bench_backtest(years):
+    import numpy as np
+    from backtest import rolling_backtest
+
+    # Random-walk prices: the timing depends only on the history length, not the data
+    days = years * 252
+    dates = np.datetime64('2000-01-03') + np.arange(days)
+    prices = 100 * np.cumprod(1 + np.random.default_rng(1).normal(0.0005, 0.01, (3, days)), axis=1)
+    return lambda: rolling_backtest(dates, prices, 10000, 250, 60, 'Mensual')
+
+
+def bench_cohort(arrival_rate):
+    visualization = _load('investment_visualization.py')
+    return lambda: visualization.simulate_investment_data(days=365, arrival_rate=arrival_rate, seed=1)
+
+
+def bench_cohort_events(arrival_rate):
+    visualization = _load('investment_visualization.py')
+    return lambda: visualization.simulate_investment_data(days=365, arrival_rate=arrival_rate, seed=1, event_driven=True)
+
+
+def _bench_export(weeks, file_format):
+    from exporters import export_to_file
+
+    simulator = _load('simulator1.0.py')
+    sheets = simulator.export_sheets(simulator.calculate_investment_scenarios(include_savings=True, **_scenario_inputs(weeks)))
+
+    def run():
+        os.remove(export_to_file(sheets, file_format))
+    return run
+
+
+def bench_export_excel(weeks):
+    return _bench_export(weeks, 'Excel')
+
+
+def bench_export_csv(weeks):
+    return _bench_export(weeks, 'CSV')
+
+
+def bench_figure(weeks):
+    simulator = _load('simulator1.0.py')
+    results = simulator.calculate_investment_scenarios(include_savings=True, **_scenario_inputs(weeks))
+    return lambda: simulator.build_scenario_figure(results, include_savings=True, show_drawdown=True)
+
+
+def bench_ownership_figure(arrival_rate):
+    from charts import top_holders_figure
+
+    visualization = _load('investment_visualization.py')
+    _, ownership = visualization.simulate_investment_data(days=365, arrival_rate=arrival_rate, seed=1)
+    return lambda: top_holders_figure(ownership["day"], ownership["topInvestor"], ownership["topPct"])
+
+
+# Case name: (setup returning the timed callable, size label, sizes from small to large)
+CASES = {
+    'scenarios': (bench_scenarios, 'weeks', (52, 520, 5_200, 52_000)),
+    'scenarios_daily': (bench_scenarios_daily, 'weeks', (52, 520, 1_560, 5_200)),
+    'scenarios_legacy': (bench_scenarios_legacy, 'weeks', (52, 520, 5_200, 52_000)),
+    'drawdown': (bench_drawdown, 'weeks', (52, 520, 5_200, 52_000)),
+    'monte_carlo': (bench_monte_carlo, 'paths', (1_000, 10_000, 100_000)),
+    'stress': (bench_stress, 'weeks', (52, 520, 1_560, 5_200)),
+    'goal_seek': (bench_goal_seek, 'clients', (1_000, 10_000, 100_000)),
+    'lot_ledger': (bench_lot_ledger, 'clients', (1_000, 10_000, 100_000)),
+    'backtest': (bench_backtest, 'years of history', (10, 20, 40)),
+    'cohort': (bench_cohort, 'arrivals/day', (1, 10, 100)),
+    'cohort_events': (bench_cohort_events, 'arrivals/day', (1, 10, 100, 1_000)),
+    'export_excel': (bench_export_excel, 'weeks', (520, 5_200, 52_000)),
+    'export_csv': (bench_export_csv, 'weeks', (520, 5_200, 52_000)),
+    'figure': (bench_figure, 'weeks', (520, 5_200, 52_000)),
+    'ownership_figure': (bench_ownership_figure, 'arrivals/day', (1, 10, 100))
+}
+
+
+def measure(run, repeat=3):
+    """Best wall time over ``repeat`` runs and peak traced memory of one more run"""
+    # Untimed warm-up absorbs lazy imports and first-call caches
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def run_suite(selected=None, quick=False, repeat=3):
+    """Measure every selected case at every size; returns {"case[size]": measurement}"""
+    results = {}
+    for name, (setup, label, sizes) in CASES.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        for size in sizes[:2] if quick else sizes:
+            key = f"{name}[{size}]"
+            results[key] = measure(setup(size), repeat)
+            results[key]['size'] = f"{size} {label}"
+            print(f"{key:<32} {results[key]['seconds'] * 1000:>10.1f} ms {results[key]['peak_bytes'] / 2 ** 20:>9.1f} MiB",
+                  flush=True)
+    return results
+
+
+def measure_import(module, repeat=3):
+    """Best cold import time of a module in fresh interpreters, and the UI modules it pulled in"""
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {UI_MODULES!r} if m in sys.modules]}}))"
+    )
+    runs = [
+        json.loads(subprocess.run([sys.executable, '-c', script], cwd=BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+    return {'seconds': min(run['seconds'] for run in runs), 'loaded': runs[0]['loaded']}
+
+
+def check_imports(repeat=3, budget=IMPORT_BUDGET):
+    """Import timings of the headless modules and the ones over budget or loading UI libraries"""
+    results = {}
+    failures = []
+    for module in HEADLESS_MODULES:
+        measurement = measure_import(module, repeat)
+        key = f"import[{module}]"
+        results[key] = {'seconds': measurement['seconds'], 'size': 'cold import'}
+        print(f"{key:<32} {measurement['seconds'] * 1000:>10.1f} ms", flush=True)
+        if measurement['seconds'] > budget:
+            failures.append(f"{module} took {measurement['seconds'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+        if measurement['loaded']:
+            failures.append(f"{module} imports {', '.join(measurement['loaded'])}")
+    return results, failures
+
+
+def compare(results, baselines, threshold=THRESHOLD):
+    """Regressions as (case, metric, baseline, current) beyond the threshold and noise floors"""
+    regressions = []
+    for key, current in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        for metric, floor in (('seconds', MIN_SECONDS), ('peak_bytes', MIN_BYTES)):
+            if metric not in current or metric not in baseline:
+                continue
+            if current[metric] > baseline[metric] * (1 + threshold) and current[metric] - baseline[metric] > floor:
+                regressions.append((key, metric, baseline[metric], current[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulators' hot paths against saved baselines")
+    parser.add_argument('-k', dest='selected', action='append', help="Only cases whose name contains this (repeatable)")
+    parser.add_argument('--quick', action='store_true', help="Only the two smallest sizes of each case")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case; the best one counts")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="Write the results as the new baselines")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="Allowed fractional growth in time or peak memory (default %(default)s)")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help="Seconds allowed for a cold import of each headless module (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.selected, args.quick, args.repeat)
+    budget_failures = []
+    if not args.selected or any(pattern in 'import' for pattern in args.selected):
+        import_results, budget_failures = check_imports(args.repeat, args.import_budget)
+        results.update(import_results)
+    for failure in budget_failures:
+        print(f"IMPORT BUDGET {failure}")
+
+    if args.save:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baseline}")
+        return 1 if budget_failures else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baselines at {args.baseline}; run with --save first")
+        return 1 if budget_failures else 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baselines = json.load(f)
+
+    regressions = compare(results, baselines, args.threshold)
+    for key, metric, baseline, current in regressions:
+        print(f"REGRESSION {key} {metric}: {baseline:.6g} -> {current:.6g} (+{(current / baseline - 1) * 100:.0f}%)")
+    if regressions or budget_failures:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} across {len(results)} measurements")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
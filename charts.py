@@ -0,0 +1,265 @@
+import numpy as np
+
+# plotly is imported inside the figure builders, so the downsampling helpers stay NumPy-only
+
+# Above this many points a trace is drawn with WebGL (Scattergl)
+WEBGL_THRESHOLD = 1000
+
+# Points kept per trace after downsampling; roughly one per screen pixel
+MAX_POINTS = 2000
+
+# Percentile pairs shaded around the median, outermost first
+FAN_BANDS = [(5, 95, 'rgba(0, 128, 0, 0.15)'), (25, 75, 'rgba(0, 128, 0, 0.30)')]
+
+
+def build_fan_chart(dates, monte_carlo, deposits=None, name="Escenario", x_range=None):
+    """Build a percentile fan chart from a run_monte_carlo result"""
+    import plotly.graph_objects as go
+
+    bands = monte_carlo['percentiles']
+    fig = go.Figure()
+
+    # Every band shares the median's points so the fills line up
+    keep = window_indices(dates, bands[50], x_range)
+    dates = np.asarray(dates)[keep]
+    trace = go.Scattergl if len(bands[50]) > WEBGL_THRESHOLD else go.Scatter
+
+    for low, high, color in FAN_BANDS:
+        fig.add_trace(trace(
+            x=dates,
+            y=bands[high][keep],
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        fig.add_trace(trace(
+            x=dates,
+            y=bands[low][keep],
+            name=f"{name} p{low}-p{high}",
+            fill='tonexty',
+            fillcolor=color,
+            line=dict(width=0)
+        ))
+
+    fig.add_trace(trace(
+        x=dates,
+        y=bands[50][keep],
+        name=f"{name} Mediana",
+        line=dict(color='green')
+    ))
+
+    if deposits is not None:
+        fig.add_trace(trace(
+            x=dates,
+            y=np.asarray(deposits)[keep],
+            name="Depósitos acumulados",
+            line=dict(dash='dash', color='blue')
+        ))
+
+    fig.update_layout(
+        title=f"Simulación Estocástica ({monte_carlo['n_paths']:,} trayectorias)",
+        xaxis_title="Fecha",
+        yaxis_title="Valor Acumulado (USD)",
+        hovermode='x unified',
+        height=600
+    )
+    return fig
+
+
+def tornado_figure(labels, swings, title="Sensibilidad", xaxis_title="Cambio en el Valor Final (USD)",
+                   step_label="10%"):
+    """Tornado chart of the change in an output when each input moves down or up by one step.
+
+    ``swings`` holds the change for a step up; the step down mirrors it (linear
+    sensitivities). The widest bar is drawn on top.
+    """
+    import plotly.graph_objects as go
+
+    swings = np.asarray(swings, dtype=float)
+    order = np.argsort(np.abs(swings))
+    labels = np.asarray(labels)[order]
+    swings = swings[order]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=labels, x=-swings, orientation='h', name=f"-{step_label}", marker_color='crimson'))
+    fig.add_trace(go.Bar(y=labels, x=swings, orientation='h', name=f"+{step_label}", marker_color='seagreen'))
+    fig.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        barmode='overlay',
+        height=400
+    )
+    return fig
+
+
+def _numeric_axis(x):
+    """Float view of an x axis for area computations; datetimes become nanoseconds"""
+    x = np.asarray(x)
+    if x.dtype == object:
+        x = x.astype('datetime64[ns]')
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices picked by Largest-Triangle-Three-Buckets downsampling of (x, y)"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _numeric_axis(x)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Bucket averages are the third vertex of each triangle
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[previous] - mean_x[i + 1]) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (mean_y[i + 1] - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def window_indices(x, y, x_range=None, max_points=MAX_POINTS):
+    """Indices of (x, y) inside the visible x range, downsampled to screen resolution"""
+    x = np.asarray(x)
+    if x.dtype == object:
+        x = x.astype('datetime64[ns]')
+    lo, hi = 0, len(x)
+    if x_range is not None:
+        lo, hi = np.searchsorted(x, np.asarray(x_range, dtype=x.dtype))
+        lo, hi = max(lo - 1, 0), min(hi + 1, len(x))
+    return lo + lttb_indices(x[lo:hi], np.asarray(y)[lo:hi], max_points)
+
+
+def visible_window(x, y, x_range=None, max_points=MAX_POINTS):
+    """Slice (x, y) to the visible x range and downsample it to screen resolution"""
+    keep = window_indices(x, y, x_range, max_points)
+    return np.asarray(x)[keep], np.asarray(y)[keep]
+
+
+def make_trace(x, y, x_range=None, max_points=MAX_POINTS, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """Scatter trace for (x, y) that downsamples and switches to WebGL for long series"""
+    import plotly.graph_objects as go
+
+    n = len(y)
+    x, y = visible_window(x, y, x_range, max_points)
+    trace = go.Scattergl if n > webgl_threshold else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+def ownership_figure(ownership, days, top_n=20, day_range=None):
+    """Ownership chart from a long (day, investor, pct) table: top holders plus an 'others' band.
+
+    With ``day_range`` only that (first, last) window of days is drawn, the
+    'others' band included.
+    """
+    import plotly.graph_objects as go
+
+    first, last = day_range if day_range is not None else (0, days - 1)
+    day = np.asarray(ownership["day"])
+    window = (day >= first) & (day <= last)
+    day = day[window]
+    investor = np.asarray(ownership["investor"])[window]
+    pct = np.asarray(ownership["pct"], dtype=float)[window]
+
+    # Rank investors by their peak ownership
+    ids, inverse = np.unique(investor, return_inverse=True)
+    peak = np.zeros(ids.size)
+    np.maximum.at(peak, inverse, pct)
+    top = np.argsort(peak)[::-1][:top_n]
+    is_top = np.isin(inverse, top)
+
+    fig = go.Figure()
+    others = np.bincount(day[~is_top] - first, weights=pct[~is_top], minlength=last - first + 1)
+    if ids.size > top_n:
+        fig.add_trace(make_trace(
+            np.arange(first, last + 1),
+            others,
+            mode="lines",
+            name=f"Others ({ids.size - top_n})",
+            fill='tozeroy',
+            line=dict(color='lightgray')
+        ))
+
+    order = np.lexsort((day[is_top], inverse[is_top]))
+    top_rows = np.flatnonzero(is_top)[order]
+    splits = np.flatnonzero(np.diff(inverse[top_rows])) + 1
+    for rows in np.split(top_rows, splits):
+        if rows.size:
+            fig.add_trace(make_trace(
+                day[rows],
+                pct[rows],
+                mode="lines",
+                name=f"Investor_{ids[inverse[rows[0]]] + 1}"
+            ))
+
+    fig.update_layout(title="Investor Ownership Percentages", xaxis_title="Day", yaxis_title="Percentage")
+    return fig
+
+
+def top_holders_figure(day, top_investor, top_pct, top_n=20, day_range=None):
+    """Ownership chart from the daily top-holder stats of simulate_cohort: top holders plus an 'others' band.
+
+    ``top_investor`` and ``top_pct`` hold each day's largest holders in
+    descending order (-1 past the active count). The ``top_n`` investors with
+    the highest peak among them get a line over the days they rank; 'others'
+    is 100 minus the lines drawn on each day.
+    """
+    import plotly.graph_objects as go
+
+    day = np.asarray(day)
+    first, last = day_range if day_range is not None else (0, day.size - 1)
+    window = (day >= first) & (day <= last)
+    day = day[window]
+    investor = np.asarray(top_investor)[window, :top_n]
+    pct = np.asarray(top_pct, dtype=float)[window, :top_n]
+    rows, cols = np.nonzero(investor >= 0)
+    investor, pct = investor[rows, cols], pct[rows, cols]
+
+    # Rank investors by their peak ownership while among the day's top holders
+    ids, inverse = np.unique(investor, return_inverse=True)
+    peak = np.zeros(ids.size)
+    np.maximum.at(peak, inverse, pct)
+    is_shown = np.isin(inverse, np.argsort(peak)[::-1][:top_n])
+
+    fig = go.Figure()
+    others = np.where(np.bincount(rows, minlength=day.size) > 0,
+                      100 - np.bincount(rows[is_shown], weights=pct[is_shown], minlength=day.size), 0.0)
+    if np.any(others > 1e-9):
+        fig.add_trace(make_trace(
+            day,
+            np.maximum(others, 0),
+            mode="lines",
+            name="Others",
+            fill='tozeroy',
+            line=dict(color='lightgray')
+        ))
+
+    order = np.lexsort((rows[is_shown], inverse[is_shown]))
+    shown_rows = np.flatnonzero(is_shown)[order]
+    splits = np.flatnonzero(np.diff(inverse[shown_rows])) + 1
+    for entries in np.split(shown_rows, splits):
+        if entries.size:
+            fig.add_trace(make_trace(
+                day[rows[entries]],
+                pct[entries],
+                mode="lines",
+                name=f"Investor_{ids[inverse[entries[0]]] + 1}"
+            ))
+
+    fig.update_layout(title="Investor Ownership Percentages", xaxis_title="Day", yaxis_title="Percentage")
+    return fig
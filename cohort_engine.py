@@ -0,0 +1,375 @@
+import numpy as np
+
+from fee_engine import DEFAULT_SCHEDULE, performance_fee_rates
+
+# Key parameters
+INVESTMENT_RANGE = (10000, 100000)
+LOCK_PERIODS = (180, 365)  # 6 months and 12 months
+EARLY_WITHDRAWAL_PENALTY = 0.1  # 10% of initial capital
+MANAGEMENT_FEE = 0.03  # 3%
+EXIT_PROBABILITY = 0.3  # Daily chance to exit once the lock period is over
+
+# Ownership statistics recorded while the simulation runs
+TOP_HOLDERS = 10
+OWNERSHIP_QUANTILES = (0.25, 0.5, 0.75, 0.95)
+
+
+def draw_cohort(rng, days, arrival_rate, initial_investors, investment_range, lock_periods):
+    """Draw every investor for the whole horizon up front as struct-of-arrays.
+
+    Investors are ordered by entry day, so the ones arriving on ``day`` are the
+    slice ``arrival_end[day - 1]:arrival_end[day]``.
+    """
+    arrivals = rng.poisson(arrival_rate, days)
+    entry_day = np.concatenate([
+        np.zeros(initial_investors, dtype=np.int64),
+        np.repeat(np.arange(days), arrivals)
+    ])
+    n = entry_day.size
+    return {
+        'investment': rng.uniform(investment_range[0], investment_range[1], n),
+        'entry_day': entry_day,
+        'lock_period': rng.choice(np.asarray(lock_periods), n),
+        'is_active': np.zeros(n, dtype=bool),
+        'exit_day': np.full(n, -1, dtype=np.int64),
+        'arrival_end': initial_investors + np.cumsum(arrivals)
+    }
+
+
+def _sorted_remove(keys, ids, remove_keys, remove_ids):
+    """Remove entries from parallel arrays kept sorted by key"""
+    lo = np.searchsorted(keys, remove_keys, side='left')
+    hi = np.searchsorted(keys, remove_keys, side='right')
+    if np.any(hi - lo != 1):
+        # Equal keys: pick each id inside its run of ties
+        lo = np.array([l + np.flatnonzero(ids[l:h] == i)[0] for l, h, i in zip(lo, hi, remove_ids)], dtype=np.int64)
+    return np.delete(keys, lo), np.delete(ids, lo)
+
+
+def _sorted_insert(keys, ids, new_keys, new_ids):
+    """Insert entries into parallel arrays kept sorted by key"""
+    order = np.argsort(new_keys, kind='stable')
+    new_keys, new_ids = new_keys[order], new_ids[order]
+    position = np.searchsorted(keys, new_keys)
+    return np.insert(keys, position, new_keys), np.insert(ids, position, new_ids)
+
+
+def _on_day(ends, day):
+    """Slice of a day-bucketed calendar holding the entries of ``day``"""
+    return slice(ends[day - 1] if day > 0 else 0, ends[day])
+
+
+def _entered_on(cohort, day):
+    """Indices of the investors that entered on ``day``"""
+    arrival_end = cohort['arrival_end']
+    return np.arange(arrival_end[day - 1] if day > 0 else 0, arrival_end[day])
+
+
+def _first_success_day(rng, start_day, probability):
+    """Day of the first success of a daily Bernoulli draw, counting from start_day"""
+    if probability <= 0:
+        return np.full(start_day.shape, np.iinfo(np.int64).max // 2)
+    return start_day + rng.geometric(min(probability, 1.0), start_day.size) - 1
+
+
+def _calendar(days_of_events, ids, days):
+    """Event ids ordered by day, with the end of each day's bucket; events past the horizon are dropped"""
+    order = np.argsort(days_of_events, kind='stable')
+    order = order[days_of_events[order] < days]
+    return ids[order], np.cumsum(np.bincount(days_of_events[order], minlength=days))
+
+
+def simulate_cohort(days=365, arrival_rate=0.15, initial_investors=5, investment_range=INVESTMENT_RANGE,
+                    lock_periods=LOCK_PERIODS, early_withdrawal_penalty=EARLY_WITHDRAWAL_PENALTY,
+                    management_fee=MANAGEMENT_FEE, exit_probability=EXIT_PROBABILITY, annual_return=0.0,
+                    fee_schedule=DEFAULT_SCHEDULE, seed=None, top_n=TOP_HOLDERS, ownership_history=False):
+    """Simulate the investor book day by day over array-backed cohorts.
+
+    Exit days are drawn up front as in simulate_cohort_events: the first of an
+    early withdrawal and a post-lock exit, early withdrawal winning ties. Exits
+    and lock expiries are bucketed by day, so each day only touches that day's
+    events and arrivals and keeps the unit totals as running sums.
+
+    Every investor holds fund units bought at the unit price on entry. The
+    fund's return and the daily management fee move the shared unit price, so
+    every investor's NAV updates in O(1). At each lock expiry the performance
+    fee crystallizes on gains over the investor's high-water mark, at the
+    ``fee_schedule`` tier for their lock period, by cancelling units. Early
+    withdrawal penalties stay in the fund for the remaining investors.
+
+    Ownership (% of units) is summarised every day as the HHI, the ``top_n``
+    holders and quantiles across active investors. With ``ownership_history``
+    the full history is also kept as a long (day, investor, pct) table holding
+    active positions only.
+    """
+    rng = np.random.default_rng(seed)
+    cohort = draw_cohort(rng, days, arrival_rate, initial_investors, investment_range, lock_periods)
+    investment = cohort['investment']
+    entry_day = cohort['entry_day']
+    lock_period = cohort['lock_period']
+    lock_months = np.rint(lock_period / 30.4).astype(np.int64)
+    n = investment.size
+
+    # Initial investors are checked on day 0, arrivals from the day after they enter
+    first_check = entry_day + (np.arange(n) >= initial_investors)
+    early_day = _first_success_day(rng, first_check, early_withdrawal_penalty / 365)
+    leave_day = _first_success_day(rng, entry_day + lock_period, exit_probability)
+    early = early_day <= leave_day
+    exit_day = np.where(early, early_day, leave_day)
+    exits, exit_end = _calendar(exit_day, np.arange(n), days)
+
+    # Every lock expiry up to the exit day; the fee crystallizes before that day's exits
+    expiry_count = (np.minimum(exit_day, days - 1) - entry_day) // lock_period
+    holder = np.repeat(np.arange(n), expiry_count)
+    k = np.arange(holder.size) - np.repeat(np.cumsum(expiry_count) - expiry_count, expiry_count) + 1
+    expiries, expiry_end = _calendar(entry_day[holder] + k * lock_period[holder], holder, days)
+
+    units = np.zeros(n)
+    hwm_price = np.ones(n)
+    performance_fees = np.zeros(n)
+    management_fees = np.zeros(n)
+    payout = np.zeros(n)
+    accrual_start = np.zeros(n, dtype=np.int64)
+
+    # Management fee per unit accrued up to the start of each day
+    accrual = np.zeros(days + 1)
+    price = 1.0
+    daily_growth = (1 + annual_return) ** (1 / 365)
+
+    # Active investors kept sorted by units, with running sums of their units and squared units
+    initial = np.arange(initial_investors)
+    units[initial] = investment[initial]
+    cohort['is_active'][initial] = True
+    active_units, active = _sorted_insert(np.empty(0), np.empty(0, dtype=np.int64), units[initial], initial)
+    total_units = units[initial].sum()
+    squared_units = np.dot(units[initial], units[initial])
+
+    total_history = np.empty(days)
+    active_history = np.empty(days, dtype=np.int64)
+    price_history = np.empty(days)
+    performance_fee_income = np.zeros(days)
+    management_fee_income = np.zeros(days)
+
+    hhi = np.zeros(days)
+    top_investor = np.full((days, top_n), -1, dtype=np.int64)
+    top_pct = np.zeros((days, top_n))
+    ownership_quantiles = np.zeros((days, len(OWNERSHIP_QUANTILES)))
+    long_investor = []
+    long_pct = []
+
+    def settle_management_fees(ids, day):
+        management_fees[ids] += units[ids] * (accrual[day] - accrual[accrual_start[ids]])
+        accrual_start[ids] = day
+
+    for day in range(days):
+        price *= daily_growth
+        # Today's changes to the units-sorted arrays, applied once at the end of the day
+        removed_units = []
+        removed = []
+        charged = np.empty(0, dtype=np.int64)
+
+        # Crystallize performance fees for investors reaching a lock expiry today
+        expiring = expiries[_on_day(expiry_end, day)]
+        if expiring.size:
+            gain = price - hwm_price[expiring]
+            fee_rate = performance_fee_rates(gain / hwm_price[expiring] * 100, lock_months[expiring], fee_schedule)
+            fee_units = units[expiring] * fee_rate * np.maximum(gain, 0) / price
+            charged = expiring[fee_units > 0]
+            if charged.size:
+                settle_management_fees(charged, day)
+                before = units[charged]
+                removed_units.append(before)
+                removed.append(charged)
+                units[charged] = before - fee_units[fee_units > 0]
+                total_units -= fee_units.sum()
+                squared_units += np.dot(units[charged], units[charged]) - np.dot(before, before)
+                performance_fees[charged] += fee_units[fee_units > 0] * price
+                performance_fee_income[day] = fee_units.sum() * price
+            hwm_price[expiring] = np.maximum(hwm_price[expiring], price)
+
+        # Process exits
+        exited = exits[_on_day(exit_end, day)]
+        if exited.size:
+            settle_management_fees(exited, day)
+            left_early = exited[early[exited]]
+            left = exited[~early[exited]]
+            payout[left_early] = units[left_early] * price * (1 - early_withdrawal_penalty)
+            payout[left] = units[left] * price
+            retained = units[left_early].sum() * price * early_withdrawal_penalty
+            cohort['is_active'][exited] = False
+            cohort['exit_day'][exited] = day
+            unchanged = exited[~np.isin(exited, charged)]
+            removed_units.append(units[unchanged])
+            removed.append(unchanged)
+            total_units -= units[exited].sum()
+            squared_units -= np.dot(units[exited], units[exited])
+
+            # Penalties stay in the fund, raising the unit price for those who remain
+            if active.size > exited.size:
+                price += retained / total_units
+            else:
+                total_units = squared_units = 0.0
+
+        # Accrue management fee
+        accrual[day + 1] = accrual[day] + price * management_fee / 365
+        management_fee_income[day] = total_units * price * management_fee / 365
+        price *= 1 - management_fee / 365
+
+        # New investors drawn up front for the whole horizon
+        new = _entered_on(cohort, day)
+        new = new[new >= initial_investors]
+        if new.size:
+            units[new] = investment[new] / price
+            hwm_price[new] = price
+            accrual_start[new] = day + 1
+            cohort['is_active'][new] = True
+            total_units += units[new].sum()
+            squared_units += np.dot(units[new], units[new])
+
+        if removed:
+            active_units, active = _sorted_remove(active_units, active, np.concatenate(removed_units),
+                                                  np.concatenate(removed))
+        inserted = np.concatenate([charged[cohort['is_active'][charged]], new])
+        if inserted.size:
+            active_units, active = _sorted_insert(active_units, active, units[inserted], inserted)
+
+        total_history[day] = total_units * price
+        active_history[day] = active.size
+        price_history[day] = price
+
+        # Ownership of the active investors only, read off the units-sorted arrays
+        if active.size:
+            scale = 100 / total_units
+            hhi[day] = squared_units * scale ** 2
+            k = min(top_n, active.size)
+            top_investor[day, :k] = active[:-k - 1:-1]
+            top_pct[day, :k] = active_units[:-k - 1:-1] * scale
+            position = np.asarray(OWNERSHIP_QUANTILES) * (active.size - 1)
+            below = np.floor(position).astype(np.int64)
+            above = np.minimum(below + 1, active.size - 1)
+            low, high = active_units[below], active_units[above]
+            ownership_quantiles[day] = (low + (high - low) * (position - below)) * scale
+            if ownership_history:
+                long_investor.append(active.astype(np.int32))
+                long_pct.append((active_units * scale).astype(np.float32))
+
+    settle_management_fees(active, days)
+
+    cohort['day'] = np.arange(days)
+    cohort['total_investment'] = total_history
+    cohort['num_active'] = active_history
+    cohort['unit_price'] = price_history
+    cohort['units'] = units
+    cohort['nav'] = np.where(cohort['is_active'], units * price, 0.0)
+    cohort['hwm_price'] = hwm_price
+    cohort['payout'] = payout
+    cohort['performance_fees'] = performance_fees
+    cohort['management_fees'] = management_fees
+    cohort['performance_fee_income'] = performance_fee_income
+    cohort['management_fee_income'] = management_fee_income
+    cohort['ownership'] = {
+        'hhi': hhi,
+        'top_investor': top_investor,
+        'top_pct': top_pct,
+        'quantile_levels': OWNERSHIP_QUANTILES,
+        'quantiles': ownership_quantiles
+    }
+    if ownership_history:
+        positions = np.array([chunk.size for chunk in long_investor])
+        cohort['ownership_history'] = {
+            'day': np.repeat(np.flatnonzero(active_history), positions).astype(np.int32),
+            'investor': np.concatenate(long_investor) if long_investor else np.empty(0, np.int32),
+            'pct': np.concatenate(long_pct) if long_pct else np.empty(0, np.float32)
+        }
+    return cohort
+
+
+def simulate_cohort_events(days=365, arrival_rate=0.15, initial_investors=5, investment_range=INVESTMENT_RANGE,
+                           lock_periods=LOCK_PERIODS, early_withdrawal_penalty=EARLY_WITHDRAWAL_PENALTY,
+                           management_fee=MANAGEMENT_FEE, exit_probability=EXIT_PROBABILITY, seed=None,
+                           liquidity_limit=None):
+    """Simulate the investor book from a calendar of exit events.
+
+    Lock expiries are known at entry, so each investor's redemption request is
+    drawn once as the first of two competing daily draws: an early withdrawal
+    from the first day they are checked, or a post-lock exit from their lock
+    expiry (early withdrawal wins ties, as in simulate_cohort). Requests join a
+    FIFO redemption queue that pays out at most ``liquidity_limit`` times the
+    fund's ``total_investment`` per day (unlimited when None). The daily step
+    only touches that day's events, so cost scales with the number of events.
+    """
+    rng = np.random.default_rng(seed)
+    cohort = draw_cohort(rng, days, arrival_rate, initial_investors, investment_range, lock_periods)
+    investment = cohort['investment']
+    entry_day = cohort['entry_day']
+    n = entry_day.size
+
+    # Initial investors are checked on day 0, arrivals from the day after they enter
+    first_check = entry_day + (np.arange(n) >= initial_investors)
+    early_day = _first_success_day(rng, first_check, early_withdrawal_penalty / 365)
+    exit_day = _first_success_day(rng, entry_day + cohort['lock_period'], exit_probability)
+    early = early_day <= exit_day
+    request_day = np.where(early, early_day, exit_day)
+    owed = np.where(early, investment * (1 - early_withdrawal_penalty), investment)
+
+    # Calendar of requests inside the horizon, in FIFO order
+    order = np.argsort(request_day, kind='stable')
+    order = order[request_day[order] < days]
+    queued_owed = np.cumsum(owed[order])
+    request_end = np.cumsum(np.bincount(request_day[order], minlength=days))
+    arrival_amounts = np.bincount(
+        entry_day[initial_investors:],
+        weights=investment[initial_investors:],
+        minlength=days
+    )
+    arrival_end = cohort['arrival_end']
+
+    total_history = np.empty(days)
+    paid_history = np.empty(days)
+    paid_total = 0.0
+    total_investment = investment[:initial_investors].sum()
+    for day in range(days):
+        # Pay the redemption queue up to today's liquidity
+        if request_end[day]:
+            requested = queued_owed[request_end[day] - 1]
+            budget = requested - paid_total
+            if liquidity_limit is not None:
+                budget = min(budget, max(total_investment, 0) * liquidity_limit)
+            total_investment -= budget
+            paid_total = requested if paid_total + budget >= requested else paid_total + budget
+
+        # Deduct management fee
+        total_investment -= total_investment * management_fee / 365
+
+        # New investors
+        total_investment += arrival_amounts[day]
+
+        total_history[day] = total_investment
+        paid_history[day] = paid_total
+
+    # Day each queued request was settled in full (-1 if still queued at the horizon)
+    settled_day = np.searchsorted(paid_history, queued_owed, side='left')
+    cohort['request_day'] = np.where(request_day < days, request_day, -1)
+    cohort['early_withdrawal'] = early & (request_day < days)
+    cohort['exit_day'][order] = np.where(settled_day < days, settled_day, -1)
+    cohort['is_active'] = cohort['request_day'] < 0
+
+    cohort['day'] = np.arange(days)
+    cohort['total_investment'] = total_history
+    cohort['num_active'] = arrival_end - request_end
+    cohort['queued'] = request_end - np.searchsorted(queued_owed, paid_history, side='right')
+
+    # HHI over the NAV of investors that have not requested redemption, as in simulate_cohort. Every
+    # NAV decays by the same management fee from the investor's first check on, so shares follow the
+    # investment discounted to day 0; running sums of that weight and its square give the HHI
+    weight = investment * (1 - management_fee / 365) ** -first_check.astype(float)
+    held, held_squares = (
+        np.cumsum(np.bincount(entry_day, weights=w, minlength=days)
+                  - np.bincount(request_day[order], weights=w[order], minlength=days))
+        for w in (weight, weight ** 2)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hhi = np.where(cohort['num_active'] > 0, held_squares / held ** 2 * 10000, 0.0)
+    cohort['ownership'] = {'hhi': hhi}
+    cohort['paid_out'] = np.diff(paid_history, prepend=0.0)
+    return cohort
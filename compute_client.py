@@ -0,0 +1,98 @@
+"""Thin client for compute_service.py.
+
+Set ``STREAKBULL_COMPUTE_URL`` (e.g. http://127.0.0.1:8765) to send the
+simulators' heavy computations to the compute service; without it, or when
+the service cannot be reached, is overloaded or fails, they run in-process as
+before. A request the service is still working on when the timeout expires
+raises instead: computing it again locally would only double the work.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+import warnings
+
+import numpy as np
+
+COMPUTE_URL = os.environ.get('STREAKBULL_COMPUTE_URL')
+# Seconds to wait for a response; a million Monte Carlo paths take about two minutes
+TIMEOUT = float(os.environ.get('STREAKBULL_COMPUTE_TIMEOUT', 600))
+
+
+def _decode(value):
+    """Undo the JSON encoding: lists become arrays (ISO dates datetime64) and integer keys become ints"""
+    if isinstance(value, dict):
+        return {int(k) if k.lstrip('-').isdigit() else k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        array = np.asarray(value)
+        if array.dtype.kind == 'U':
+            try:
+                return array.astype('datetime64')
+            except ValueError:
+                pass
+        return array
+    return value
+
+
+class ComputeError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ComputeClient:
+    """Calls compute service endpoints and returns results as NumPy arrays"""
+
+    def __init__(self, url=COMPUTE_URL, timeout=TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        request = urllib.request.Request(
+            self.url + path,
+            data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise ComputeError(f"{path}: {e.code} {message}", e.code) from e
+        except TimeoutError as e:
+            # Connected and sent: the service may still be computing, so this is not a connection failure
+            raise ComputeError(f"{path}: no response within {self.timeout:g}s") from e
+
+    def compute(self, name, **params):
+        body = json.dumps(params, default=lambda v: v.tolist()).encode('utf-8')
+        return _decode(self._request(f'/compute/{name}', body))
+
+    def stats(self):
+        return self._request('/stats')
+
+    def healthy(self):
+        try:
+            return self._request('/health').get('status') == 'ok'
+        except (ComputeError, urllib.error.URLError, OSError):
+            return False
+
+
+def compute(name, **params):
+    """Run an endpoint on the compute service if configured, otherwise in-process"""
+    if COMPUTE_URL:
+        try:
+            return ComputeClient(COMPUTE_URL).compute(name, **params)
+        except ComputeError as e:
+            # A full queue (503) or a failing service (5xx) is no reason to fail the caller
+            if e.status is None or e.status < 500:
+                raise
+            warnings.warn(f"Compute service error ({e}); computing locally")
+        except (urllib.error.URLError, ConnectionError) as e:
+            # Refused, unreachable or dropped connections: the service is not computing this request
+            warnings.warn(f"Compute service unavailable ({e}); computing locally")
+
+    from compute_service import ENDPOINTS
+    return ENDPOINTS[name](**params)
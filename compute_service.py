@@ -0,0 +1,229 @@
+"""Local HTTP compute service for the simulators.
+
+    python compute_service.py --port 8765 --workers 4
+
+Exposes the scenario, drawdown, fee, Monte Carlo, backtest, stress-test,
+goal-seek, lot-ledger and cohort functions as JSON endpoints
+(``POST /compute/<name>`` with the keyword arguments as a JSON object).
+Results are shared by every client through one bounded cache, and
+computations run on a bounded process pool, so heavy requests never compete
+with the Streamlit reruns. ``GET /health`` and ``GET /stats`` report status.
+The front-ends reach it through compute_client.py.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from backtest import run_backtest
+from cohort_engine import simulate_cohort, simulate_cohort_events
+from drawdown import drawdown_analytics
+from fee_engine import DEFAULT_SCHEDULE, performance_fee_rates, cascade_splits
+from goal_seek import solve_goal
+from lot_ledger import ledger_results
+from monte_carlo import run_monte_carlo
+from result_cache import BoundedCache
+from scenario_engine import ScenarioResults, scenario_results, evaluate_grid
+from stress_test import stress_results
+
+HOST = os.environ.get('STREAKBULL_COMPUTE_HOST', '127.0.0.1')
+PORT = int(os.environ.get('STREAKBULL_COMPUTE_PORT', 8765))
+
+# Computations running at once; further requests queue up to MAX_PENDING, then get 503
+COMPUTE_WORKERS = int(os.environ.get('STREAKBULL_COMPUTE_WORKERS', os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get('STREAKBULL_COMPUTE_PENDING', 64))
+
+
+def drawdown(values, periods_per_year=52):
+    return drawdown_analytics(np.asarray(values, dtype=float), periods_per_year)
+
+
+def fees(return_pct, lock_period, schedule=DEFAULT_SCHEDULE):
+    return {
+        'fee_rate': performance_fee_rates(return_pct, lock_period, schedule),
+        'cascade': cascade_splits(return_pct, lock_period, schedule)
+    }
+
+
+ENDPOINTS = {
+    'scenarios': scenario_results,
+    'grid': evaluate_grid,
+    'drawdown': drawdown,
+    'fees': fees,
+    'monte_carlo': run_monte_carlo,
+    'backtest': run_backtest,
+    'stress': stress_results,
+    'goal_seek': solve_goal,
+    'lots': ledger_results,
+    'cohort': simulate_cohort,
+    'cohort_events': simulate_cohort_events
+}
+
+
+def _encode(value):
+    """JSON fallback for NumPy arrays and scalars, and ScenarioResults as their dict layout"""
+    if isinstance(value, ScenarioResults):
+        return value.as_dict()
+    if isinstance(value, (np.ndarray, np.generic)):
+        if value.dtype.kind == 'M':
+            return np.datetime_as_string(value).tolist()
+        if value.dtype.names:
+            # Record arrays such as the ledger lots travel as one column per field
+            return {name: value[name] for name in value.dtype.names}
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    return json.dumps(value, default=_encode).encode('utf-8')
+
+
+# Params forced inside the service process: its pool already spreads requests over processes
+SERVICE_PARAMS = {
+    'monte_carlo': {'workers': 1}
+}
+
+# Results that depend on more than the params are only cached when the params pin them down:
+# random draws need an explicit integer seed and date axes an explicit start; price files can change
+SEEDED_ENDPOINTS = ('monte_carlo', 'cohort', 'cohort_events')
+DATED_ENDPOINTS = ('scenarios',)
+UNCACHED_ENDPOINTS = ('backtest',)
+
+
+def cacheable(name, params):
+    """Whether a request's result depends on its params alone"""
+    if name in UNCACHED_ENDPOINTS:
+        return False
+    if name in SEEDED_ENDPOINTS:
+        seed = params.get('seed')
+        if not isinstance(seed, int) or isinstance(seed, bool):
+            return False
+    if name in DATED_ENDPOINTS and params.get('start') is None:
+        return False
+    return True
+
+
+def _call(name, params):
+    return ENDPOINTS[name](**dict(params, **SERVICE_PARAMS.get(name, {})))
+
+
+class ComputeService:
+    """Endpoint dispatch over a bounded process pool with a shared result cache"""
+
+    def __init__(self, workers=COMPUTE_WORKERS, max_pending=MAX_PENDING, cache=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self.cache = BoundedCache() if cache is None else cache
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def compute(self, name, params):
+        """Serialized result for an endpoint; None when the queue is full"""
+        cached = cacheable(name, params)
+        key = (name, json.dumps(params, sort_keys=True))
+        if cached:
+            body = self.cache.get(key)
+            if body is not None:
+                return body
+
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            body = dumps(self.executor.submit(_call, name, params).result())
+        finally:
+            self._slots.release()
+        if cached:
+            self.cache.set(key, body)
+        return body
+
+    def stats(self):
+        return dict(self.cache.stats(), workers=self.workers)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._reply(status, dumps({'error': message}))
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, dumps({'status': 'ok'}))
+        elif self.path == '/stats':
+            self._reply(200, dumps(self.service.stats()))
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+    def do_POST(self):
+        prefix = '/compute/'
+        name = self.path[len(prefix):] if self.path.startswith(prefix) else None
+        if name not in ENDPOINTS:
+            self._error(404, f"unknown endpoint {self.path}")
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("request body must be a JSON object")
+        except ValueError as e:
+            self._error(400, f"invalid request body: {e}")
+            return
+
+        try:
+            body = self.service.compute(name, params)
+        except (TypeError, ValueError, KeyError) as e:
+            self._error(400, f"{type(e).__name__}: {e}")
+            return
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+            return
+        if body is None:
+            self._error(503, "compute queue is full")
+            return
+        self._reply(200, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=HOST, port=PORT, workers=COMPUTE_WORKERS, max_pending=MAX_PENDING):
+    """Run the service until interrupted"""
+    service = ComputeService(workers, max_pending)
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Compute service on http://{host}:{server.server_port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the simulators' compute functions over local HTTP")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=COMPUTE_WORKERS, help="Computations running at once")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING, help="Queued requests before replying 503")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.max_pending)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def drawdown_analytics(values, periods_per_year=52):
+    """Drawdown statistics for every path of a 1-D or (paths x time) array.
+
+    Drawdowns are positive percentages below the running maximum. Returns a
+    dict with the underwater curve (same shape as ``values``) and, per path,
+    the maximum drawdown, the longest stretch spent underwater, the number of
+    periods from the deepest trough back to its previous peak (NaN while not
+    recovered) and the Calmar ratio (annualized growth over maximum drawdown).
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[-1]
+    t = np.arange(n)
+
+    running_max = np.maximum.accumulate(values, axis=-1)
+    underwater = (running_max - values) / running_max * 100
+    max_drawdown = underwater.max(axis=-1)
+
+    # Periods since the last peak; the longest run is the drawdown duration
+    at_peak = values >= running_max
+    last_peak = np.maximum.accumulate(np.where(at_peak, t, 0), axis=-1)
+    max_duration = (t - last_peak).max(axis=-1)
+
+    # First return to a peak after the deepest trough
+    trough = underwater.argmax(axis=-1)
+    recovered = at_peak & (t > trough[..., None])
+    time_to_recovery = np.where(
+        recovered.any(axis=-1),
+        recovered.argmax(axis=-1) - trough,
+        np.nan
+    )
+    time_to_recovery = np.where(max_drawdown > 0, time_to_recovery, 0)
+
+    years = max(n - 1, 1) / periods_per_year
+    annual_growth = (values[..., -1] / values[..., 0]) ** (1 / years) - 1
+    calmar = np.divide(
+        annual_growth,
+        max_drawdown / 100,
+        out=np.full(np.shape(max_drawdown), np.inf),
+        where=max_drawdown > 0
+    )
+
+    return {
+        'underwater': underwater,
+        'max_drawdown': max_drawdown,
+        'max_duration': max_duration,
+        'time_to_recovery': time_to_recovery,
+        'calmar': calmar
+    }
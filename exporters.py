@@ -0,0 +1,119 @@
+import csv
+import os
+import tempfile
+
+import numpy as np
+
+# Rows converted from the result arrays at a time
+CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet')
+}
+
+
+def _as_array(values):
+    """Array view of a result column; lists of datetimes become datetime64"""
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype('datetime64[us]')
+    return values
+
+
+def iter_chunks(columns, chunk_rows=CHUNK_ROWS):
+    """Yield dicts of equal-length column slices of at most chunk_rows rows"""
+    columns = {name: _as_array(values) for name, values in columns.items()}
+    n = len(next(iter(columns.values()))) if columns else 0
+    for start in range(0, n, chunk_rows):
+        yield {name: values[start:start + chunk_rows] for name, values in columns.items()}
+
+
+def _python_values(values):
+    """Python scalars for one chunk, with datetime64 converted to datetime"""
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[us]').tolist()
+    return values.tolist()
+
+
+def write_xlsx(path, sheets, chunk_rows=CHUNK_ROWS):
+    """Write {sheet name: columns} with xlsxwriter's constant-memory row writer"""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    for sheet_name, columns in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, list(columns))
+        row = 1
+        for chunk in iter_chunks(columns, chunk_rows):
+            for col, values in enumerate(chunk.values()):
+                if np.issubdtype(values.dtype, np.datetime64):
+                    worksheet.set_column(col, col, 12, date_format)
+            for values in zip(*(_python_values(v) for v in chunk.values())):
+                worksheet.write_row(row, 0, values)
+                row += 1
+    workbook.close()
+
+
+def write_csv(path, columns, chunk_rows=CHUNK_ROWS):
+    """Write columns to CSV one chunk at a time"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(columns))
+        for chunk in iter_chunks(columns, chunk_rows):
+            writer.writerows(zip(*(
+                np.datetime_as_string(v).tolist() if np.issubdtype(v.dtype, np.datetime64) else v.tolist()
+                for v in chunk.values()
+            )))
+
+
+def write_parquet(path, columns, chunk_rows=CHUNK_ROWS):
+    """Write columns to Parquet, one row group per chunk (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from e
+
+    writer = None
+    try:
+        for chunk in iter_chunks(columns, chunk_rows):
+            table = pa.table({name: pa.array(values) for name, values in chunk.items()})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_to_file(sheets, file_format='Excel', chunk_rows=CHUNK_ROWS):
+    """Stream {sheet name: columns} to a temporary file and return its path.
+
+    CSV and Parquet hold a single table, so only the first sheet is written.
+    The caller is responsible for removing the file.
+    """
+    extension, _ = EXPORT_FORMATS[file_format]
+    fd, path = tempfile.mkstemp(prefix='streakbull_', suffix=f'.{extension}')
+    os.close(fd)
+    try:
+        if file_format == 'Excel':
+            write_xlsx(path, sheets, chunk_rows)
+        elif file_format == 'CSV':
+            write_csv(path, next(iter(sheets.values())), chunk_rows)
+        else:
+            write_parquet(path, next(iter(sheets.values())), chunk_rows)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
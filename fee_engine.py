@@ -0,0 +1,100 @@
+import csv
+import os
+
+import numpy as np
+
+FEE_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fee_tiers.csv')
+CASCADE_COLUMNS = ('cascade_level_1', 'cascade_level_2', 'cascade_level_3')
+
+# simulator1.0.py and the investor simulation; simulator.py uses 'legacy'
+DEFAULT_SCHEDULE = 'streakbull'
+
+
+def _number(text, default):
+    return float(text) if text.strip() else default
+
+
+def load_fee_table(path=FEE_TABLE_PATH):
+    """Load the tier table as {schedule: {lock period (None for any): tiers}}.
+
+    Each tier set holds the upper return bound of every band (%), the fee
+    rate as a fraction and the cascade split columns, sorted by return band.
+    """
+    rows = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            lock = int(row['lock_period']) if row['lock_period'].strip() else None
+            rows.setdefault(row['schedule'], {}).setdefault(lock, []).append((
+                _number(row['return_upper'], np.inf),
+                _number(row['fee_pct'], 0.0) / 100,
+                [_number(row[col], 0.0) for col in CASCADE_COLUMNS]
+            ))
+
+    table = {}
+    for schedule, by_lock in rows.items():
+        table[schedule] = {}
+        for lock, tiers in by_lock.items():
+            tiers.sort(key=lambda tier: tier[0])
+            table[schedule][lock] = {
+                'return_upper': np.array([tier[0] for tier in tiers]),
+                'fee_rate': np.array([tier[1] for tier in tiers]),
+                'cascade': np.array([tier[2] for tier in tiers])
+            }
+    return table
+
+
+FEE_TABLE = load_fee_table()
+
+
+def _lookup(return_pct, lock_period, schedule, field, table):
+    """Gather a tier field for arrays of returns via sorted-breakpoint search"""
+    by_lock = table[schedule]
+    return_pct, lock_period = np.broadcast_arrays(
+        np.asarray(return_pct, dtype=float),
+        np.asarray(0 if lock_period is None else lock_period)
+    )
+    trailing = next(iter(by_lock.values()))[field].shape[1:]
+    out = np.full(return_pct.shape + trailing, np.nan)
+    for lock, tiers in by_lock.items():
+        mask = np.ones(return_pct.shape, dtype=bool) if lock is None else lock_period == lock
+        idx = np.searchsorted(tiers['return_upper'], return_pct[mask], side='left')
+        out[mask] = tiers[field][np.minimum(idx, len(tiers['return_upper']) - 1)]
+    return out
+
+
+def performance_fee_rates(return_pct, lock_period, schedule=DEFAULT_SCHEDULE, table=FEE_TABLE):
+    """Performance fee rate (fraction) for arrays of returns (%) and lock periods (months)"""
+    return _lookup(return_pct, lock_period, schedule, 'fee_rate', table)
+
+
+def cascade_splits(return_pct, lock_period, schedule=DEFAULT_SCHEDULE, table=FEE_TABLE):
+    """Cascade split columns (percentage points) for arrays of returns; shape (..., 3)"""
+    return _lookup(return_pct, lock_period, schedule, 'cascade', table)
+
+
+def apply_performance_fees(values, deposits, lock_period, schedule=DEFAULT_SCHEDULE, table=FEE_TABLE):
+    """Charge the performance fee on gains over deposits across whole path matrices.
+
+    Every point is treated as if the fee crystallized there, using the tier of
+    its own return. Returns the net values and the fee rates applied.
+    """
+    values = np.asarray(values, dtype=float)
+    gains = values - deposits
+    # Zero deposits (an empty client or a goal-seek candidate) have no return; their gain and fee are 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_pct = gains / deposits * 100
+    fee_rates = performance_fee_rates(return_pct, lock_period, schedule, table)
+    return values - fee_rates * np.maximum(gains, 0), fee_rates
+
+
+def cascade_config(schedule=DEFAULT_SCHEDULE, lock_period=6, table=FEE_TABLE):
+    """Tiers as {"0-15%": [fee %, cascade 1, cascade 2, cascade 3], ...}"""
+    by_lock = table[schedule]
+    tiers = by_lock.get(lock_period, by_lock.get(None))
+    config = {}
+    lower = 0
+    for upper, rate, cascade in zip(tiers['return_upper'], tiers['fee_rate'], tiers['cascade']):
+        label = f"{lower:g}-{upper:g}%" if np.isfinite(upper) else f"{lower:g}%+"
+        config[label] = [round(float(rate) * 100, 6)] + cascade.tolist()
+        lower = upper
+    return config
@@ -0,0 +1,203 @@
+"""Goal seek: the value of one scenario input that reaches a target final value.
+
+solve_goal inverts the weekly closed form of evaluate_rows for the periodic
+savings, initial capital, horizon or annual rate of arrays of clients at
+once, with every other input fixed. The target is the net-of-fee final
+value by default, so lock periods and fee tiers apply exactly as in the
+simulators.
+
+The fee is a step function of the return, so the net value jumps at tier
+edges. For each fee rate of the schedule the net value is monotone in the
+unknown and is solved exactly: in closed form for savings and capital,
+which enter the value linearly, and by vectorized bisection for the rate.
+The unknowns where the return crosses a tier edge are added as candidates,
+every candidate is re-evaluated under the real fee rules, and the smallest
+one that reaches the target wins. Horizons are whole savings periods: the
+first one reaching the target is found between the horizons that the gross
+value and the worst-fee value need, which bracket it.
+"""
+import numpy as np
+
+from fee_engine import DEFAULT_SCHEDULE, FEE_TABLE, apply_performance_fees
+from scenario_engine import WEEKS_PER_PERIOD, weekly_rates, lock_weeks, annuity_factor
+
+SOLVABLE = ('periodic_savings', 'initial_capital', 'periods', 'annual_rate')
+
+# Search limits for the bisection solvers
+MAX_PERIODS = 1560
+RATE_BOUNDS = (-0.99, 100.0)
+BISECTION_STEPS = 100
+
+# Candidates are nudged off tier edges by this relative amount before re-evaluation
+EDGE_NUDGE = 1e-9
+TOLERANCE = 1e-9
+
+
+def _fee_levels(schedule, table=FEE_TABLE):
+    """Every fee rate of a schedule plus zero (no fee on losses)"""
+    rates = np.concatenate([tiers['fee_rate'] for tiers in table[schedule].values()])
+    return np.union1d(rates, [0.0])
+
+
+def _return_edges(schedule, table=FEE_TABLE):
+    """Finite tier edges of a schedule, as fractions of deposits"""
+    edges = np.concatenate([tiers['return_upper'] for tiers in table[schedule].values()])
+    return np.unique(edges[np.isfinite(edges)]) / 100
+
+
+def _coefficients(periods, factor, rate, start):
+    """Weeks elapsed t and the final value per unit of capital (G) and of weekly savings (K)"""
+    t = np.rint(periods * factor) - 1
+    compounding_weeks = np.maximum(t - start + 1, 0)
+    growth = np.exp(compounding_weeks * np.log1p(rate))
+    per_saving = np.minimum(t, start - 1) * growth + annuity_factor(rate, compounding_weeks)
+    return t, growth, per_saving
+
+
+def _evaluate(capital, savings_weekly, periods, factor, rate, start, lock, schedule, net_of_fees):
+    """Final value (net of fees if asked), gross final value and deposits"""
+    t, growth, per_saving = _coefficients(periods, factor, rate, start)
+    final_value = capital * growth + savings_weekly * per_saving
+    deposits = capital + savings_weekly * t
+    value = final_value
+    if net_of_fees:
+        value, _ = apply_performance_fees(final_value, deposits, lock, schedule)
+    return value, final_value, deposits
+
+
+def _smallest_reaching(candidates, evaluate, target, minimum=-np.inf):
+    """Smallest finite candidate >= minimum (rows along the last axis) whose value reaches the target"""
+    valid = np.isfinite(candidates) & (candidates >= minimum)
+    with np.errstate(invalid='ignore', over='ignore'):
+        value = evaluate(np.where(valid, candidates, 0.0))
+    reaches = valid & (value >= target * (1 - TOLERANCE))
+    best = np.where(reaches, candidates, np.inf).min(axis=0)
+    return np.where(np.isfinite(best), best, np.nan)
+
+
+def _nudged(values):
+    return np.concatenate([values, values * (1 - EDGE_NUDGE), values * (1 + EDGE_NUDGE)])
+
+
+def _bisect(increasing, target, lo, hi, steps=BISECTION_STEPS):
+    """Smallest x in [lo, hi] with increasing(x) >= target, elementwise (hi where none)"""
+    lo, hi, target = np.broadcast_arrays(lo, hi, target)
+    lo, hi = lo.astype(float), hi.astype(float)
+    for _ in range(steps):
+        mid = (lo + hi) / 2
+        above = increasing(mid) >= target
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid)
+    return hi
+
+
+def _first_period(reaches, lo, hi):
+    """Smallest integer in [lo, hi] where a monotone predicate holds, elementwise (hi + 1 where none)"""
+    lo, hi = lo.copy(), hi + 1
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        above = reaches(mid)
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid + 1)
+    return lo
+
+
+def solve_goal(target, solve_for, initial_capital=0.0, periodic_savings=0.0, periods=52, lock_period=6,
+               savings_frequency='Semanal', annual_rate=0.0, lock_delays_returns=False,
+               fee_schedule=DEFAULT_SCHEDULE, net_of_fees=True, max_periods=MAX_PERIODS):
+    """Smallest value of ``solve_for`` whose final value reaches ``target``, per client row.
+
+    ``solve_for`` is one of SOLVABLE and its own argument is ignored; every
+    other argument is a scalar or a per-row sequence. Savings and capital are
+    solved over non-negative amounts, periods over 1 .. ``max_periods``
+    (assuming non-negative rates) and the rate over RATE_BOUNDS. Returns the
+    solved 'value' (NaN where the target is out of reach) and the
+    'final_value', 'net_final_value' and 'deposits' it gives.
+    """
+    if solve_for not in SOLVABLE:
+        raise ValueError(f"solve_for must be one of {', '.join(SOLVABLE)}")
+    target = np.asarray(target, dtype=float)
+    factor = np.array([WEEKS_PER_PERIOD.get(f, 1) for f in np.atleast_1d(savings_frequency)])
+    target, capital, savings, periods, lock, factor, annual_rate = np.broadcast_arrays(
+        target,
+        np.asarray(initial_capital, dtype=float),
+        np.asarray(periodic_savings, dtype=float),
+        np.asarray(periods, dtype=int),
+        np.asarray(lock_period, dtype=int),
+        factor,
+        np.asarray(annual_rate, dtype=float)
+    )
+    start = np.maximum(lock_weeks(lock), 1) if lock_delays_returns else np.ones_like(lock)
+    levels = _fee_levels(fee_schedule)[:, None] if net_of_fees else np.zeros((1, 1))
+    edges = _return_edges(fee_schedule)[:, None] if net_of_fees else np.zeros((0, 1))
+    inputs = dict(capital=capital, savings=savings, periods=periods, rate=annual_rate)
+
+    def evaluate(capital=capital, savings=savings, periods=periods, rate=annual_rate, net_of_fees=net_of_fees):
+        return _evaluate(capital, savings / factor, periods, factor, weekly_rates(rate), start, lock,
+                         fee_schedule, net_of_fees)
+
+    if solve_for in ('periodic_savings', 'initial_capital'):
+        t, growth, per_saving = _coefficients(periods, factor, weekly_rates(annual_rate), start)
+        # Net value with fee f on gains: C * ((1 - f) G + f) + s * ((1 - f) K + f t)
+        per_capital = (1 - levels) * growth + levels
+        per_weekly = (1 - levels) * per_saving + levels * t
+        one_plus_edge = 1 + edges
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if solve_for == 'periodic_savings':
+                exact = (target - capital * per_capital) / per_weekly * factor
+                at_edges = capital * (one_plus_edge - growth) / (per_saving - one_plus_edge * t) * factor
+            else:
+                exact = (target - savings / factor * per_weekly) / per_capital
+                at_edges = savings / factor * (per_saving - one_plus_edge * t) / (one_plus_edge - growth)
+        candidates = np.concatenate([exact, _nudged(at_edges), np.zeros((1,) + target.shape)])
+        key = 'savings' if solve_for == 'periodic_savings' else 'capital'
+        value = _smallest_reaching(candidates, lambda x: evaluate(**{key: x})[0], target, minimum=0.0)
+        inputs[key] = np.nan_to_num(value)
+
+    elif solve_for == 'annual_rate':
+        # At each fee level the net value rises with the rate; edges are where the return crosses a tier
+        deposits = evaluate()[2]
+        exact = np.array([
+            _bisect(lambda rate: (1 - f) * evaluate(rate=rate)[1] + f * deposits, target, *RATE_BOUNDS)
+            for f in levels[:, 0]
+        ])
+        at_edges = np.array([
+            _bisect(lambda rate: evaluate(rate=rate)[1], (1 + e) * deposits, *RATE_BOUNDS)
+            for e in edges[:, 0]
+        ]).reshape((-1,) + target.shape)
+        value = _smallest_reaching(np.concatenate([exact, _nudged(at_edges)]), lambda x: evaluate(rate=x)[0], target)
+        inputs['rate'] = np.nan_to_num(value)
+
+    else:
+        # The gross value and the worst-fee value both rise with the horizon and bracket the net one
+        first, last = np.ones_like(periods), np.full_like(periods, max_periods)
+        lower = _first_period(lambda p: evaluate(periods=p)[1] >= target, first, last)
+        upper = _first_period(
+            lambda p: _worst_fee_value(*evaluate(periods=p)[1:], levels.max()) >= target,
+            lower,
+            last
+        )
+        upper = np.minimum(upper, last)
+        value = np.full(target.shape, np.nan)
+        for offset in range(int(np.max(upper - lower, initial=-1)) + 1):
+            p = lower + offset
+            reaches = np.isnan(value) & (p <= upper) & (evaluate(periods=p)[0] >= target * (1 - TOLERANCE))
+            value = np.where(reaches, p, value)
+        inputs['periods'] = np.nan_to_num(value, nan=1).astype(int)
+
+    net_final_value, final_value, deposits = _evaluate(
+        inputs['capital'], inputs['savings'] / factor, inputs['periods'], factor, weekly_rates(inputs['rate']),
+        start, lock, fee_schedule, True
+    )
+    unsolved = np.isnan(value)
+    return {
+        'value': value,
+        'final_value': np.where(unsolved, np.nan, final_value),
+        'net_final_value': np.where(unsolved, np.nan, net_final_value),
+        'deposits': np.where(unsolved, np.nan, deposits)
+    }
+
+
+def _worst_fee_value(final_value, deposits, fee_rate):
+    """Net value if the highest fee rate applied to any gain"""
+    return final_value - fee_rate * np.maximum(final_value - deposits, 0)
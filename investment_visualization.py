@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
-from io import StringIO
+from compute_client import compute
+from fee_engine import cascade_config
+from charts import make_trace, top_holders_figure, MAX_POINTS
+from perf_metrics import StageTimer, debug_panel
 
 # Key parameters
 investmentRange = {
@@ -12,125 +14,173 @@ investmentRange = {
 lockPeriods = [180, 365]  # 6 months and 12 months
 earlyWithdrawalPenalty = 0.1  # 10% of initial capital
 managementFee = 0.03  # 3%
-performanceFeeConfig = {  # Commission cascade scheme
-    "0-15%": [18, 3.0, 0.0, 0.0],
-    "15-35%": [24, 5.7, 9.3, 0.0],
-    "35-60%": [33, 11.4, 23.6, 0.0],
-    "60%+": [39, 22.8, 37.2, 0.0]
-}
-
-def simulate_investment_data():
-    days = 365
-    poisson_rate = 0.15
-    total_investment = 0
-    portfolio = defaultdict(dict)
-    history = []
-
-    # Helper function to create an investor
-    def create_investor(day):
-        investment = np.random.uniform(investmentRange["min"], investmentRange["max"])
-        lock_period = lockPeriods[0] if np.random.random() < 0.5 else lockPeriods[1]  # 6 or 12 months
-        return {
-            "investment": investment,
-            "entryDay": day,
-            "lockPeriod": lock_period,
-            "isActive": True
-        }
-
-    # Initial investors
-    for i in range(5):
-        investor_id = f"Investor_{i+1}"
-        portfolio[investor_id] = create_investor(0)
-        total_investment += portfolio[investor_id]["investment"]
-
-    # Simulate days
-    for day in range(days):
-        # Process exits
-        for investor_id, investor in portfolio.items():
-            if not investor["isActive"]:
-                continue
-
-            # Check for early withdrawal
-            if np.random.random() < earlyWithdrawalPenalty / 365:  # Daily probability
-                investor["isActive"] = False
-                total_investment -= investor["investment"] * (1 - earlyWithdrawalPenalty)
-
-            # Check for lock period expiry
-            elif day - investor["entryDay"] >= investor["lockPeriod"]:
-                if np.random.random() < 0.3:  # 30% chance to exit after lock period
-                    investor["isActive"] = False
-                    total_investment -= investor["investment"]
-
-        # Deduct management fee
-        total_investment -= total_investment * managementFee / 365
-
-        # New investors (Poisson distribution)
-        num_new_investors = 1 if np.random.random() < poisson_rate else 0
-
-        for _ in range(num_new_investors):
-            investor_id = f"Investor_{len(portfolio) + 1}"
-            new_investor = create_investor(day)
-            portfolio[investor_id] = new_investor
-            total_investment += new_investor["investment"]
-
-        # Calculate percentages and create daily snapshot
-        day_data = {
-            "day": day,
-            "totalInvestment": total_investment,
-            "numInvestors": sum(1 for inv in portfolio.values() if inv["isActive"]),
-            "activeInvestors": 0,
-            "percentages": {}
+performanceFeeConfig = cascade_config()  # Commission cascade scheme, from data/fee_tiers.csv
+maxInvestorsShown = 200  # Daily top holders recorded by the simulation
+
+def simulate_investment_data(days=365, arrival_rate=0.15, early_withdrawal_penalty=earlyWithdrawalPenalty,
+                             management_fee=managementFee, seed=None, event_driven=False, liquidity_limit=None,
+                             annual_return=0.0, ownership_history=False, timer=None):
+    timer = timer or StageTimer('investment_visualization')
+    if event_driven:
+        # Aggregates only; the calendar never visits individual investors day by day
+        with timer.stage('simulation') as stage:
+            cohort = compute(
+                'cohort_events',
+                days=days,
+                arrival_rate=arrival_rate,
+                investment_range=(investmentRange["min"], investmentRange["max"]),
+                lock_periods=lockPeriods,
+                early_withdrawal_penalty=early_withdrawal_penalty,
+                management_fee=management_fee,
+                seed=seed,
+                liquidity_limit=liquidity_limit
+            )
+            stage['payload'] = cohort
+        with timer.stage('dataframe') as stage:
+            data = pd.DataFrame({
+                "day": cohort["day"],
+                "totalInvestment": cohort["total_investment"],
+                "numInvestors": cohort["num_active"],
+                "activeInvestors": cohort["num_active"],
+                "queuedRedemptions": cohort["queued"],
+                "hhi": cohort["ownership"]["hhi"]
+            })
+            stage['payload'] = data
+        return data, None
+
+    with timer.stage('simulation') as stage:
+        cohort = compute(
+            'cohort',
+            days=days,
+            arrival_rate=arrival_rate,
+            investment_range=(investmentRange["min"], investmentRange["max"]),
+            lock_periods=lockPeriods,
+            early_withdrawal_penalty=early_withdrawal_penalty,
+            management_fee=management_fee,
+            annual_return=annual_return,
+            seed=seed,
+            top_n=maxInvestorsShown,
+            ownership_history=ownership_history
+        )
+        stage['payload'] = cohort
+    with timer.stage('dataframe') as stage:
+        data = pd.DataFrame({
+            "day": cohort["day"],
+            "totalInvestment": cohort["total_investment"],
+            "numInvestors": cohort["num_active"],
+            "activeInvestors": cohort["num_active"],
+            "unitPrice": cohort["unit_price"],
+            "managementFees": cohort["management_fee_income"],
+            "performanceFees": cohort["performance_fee_income"],
+            "hhi": cohort["ownership"]["hhi"]
+        })
+
+        # Daily top holders; the long (day, investor, pct) table of every position only when asked for
+        ownership = {
+            "day": cohort["day"],
+            "topInvestor": cohort["ownership"]["top_investor"],
+            "topPct": cohort["ownership"]["top_pct"]
         }
-
-        for investor_id, investor in portfolio.items():
-            if investor["isActive"]:
-                day_data[f"{investor_id}_pct"] = (investor["investment"] / total_investment) * 100
-                day_data["activeInvestors"] += 1
-            else:
-                day_data[f"{investor_id}_pct"] = 0
-
-        history.append(day_data)
-
-    return pd.DataFrame(history)
-
-def plot_investment_charts(data):
-    # Total Investment Over Time
-    total_investment_fig = go.Figure()
-    total_investment_fig.add_trace(go.Scatter(x=data["day"], y=data["totalInvestment"], mode="lines", name="Total Investment"))
-    total_investment_fig.update_layout(title="Total Investment Over Time", xaxis_title="Day", yaxis_title="Investment")
-
-    # Active Investors Over Time
-    active_investors_fig = go.Figure()
-    active_investors_fig.add_trace(go.Scatter(x=data["day"], y=data["numInvestors"], mode="lines", name="Active Investors"))
-    active_investors_fig.update_layout(title="Active Investors Over Time", xaxis_title="Day", yaxis_title="Investors")
-
-    # Investor Ownership Percentages
-    investor_ownership_fig = go.Figure()
-    for col in data.columns:
-        if col.endswith("_pct"):
-            investor_ownership_fig.add_trace(go.Scatter(x=data["day"], y=data[col], mode="lines", name=col.replace("_pct", "")))
-    investor_ownership_fig.update_layout(title="Investor Ownership Percentages", xaxis_title="Day", yaxis_title="Percentage")
-
-    st.plotly_chart(total_investment_fig, use_container_width=True)
-    st.plotly_chart(active_investors_fig, use_container_width=True)
-    st.plotly_chart(investor_ownership_fig, use_container_width=True)
+        if ownership_history:
+            ownership["history"] = pd.DataFrame(cohort["ownership_history"])
+        stage['payload'] = (data, ownership)
+    return data, ownership
+
+def plot_investment_charts(data, ownership=None, day_range=None, top_n=20, timer=None):
+    timer = timer or StageTimer('investment_visualization')
+    with timer.stage('figures') as stage:
+        # Total Investment Over Time
+        total_investment_fig = go.Figure()
+        total_investment_fig.add_trace(make_trace(data["day"], data["totalInvestment"], x_range=day_range, mode="lines", name="Total Investment"))
+        total_investment_fig.update_layout(title="Total Investment Over Time", xaxis_title="Day", yaxis_title="Investment")
+
+        # Active Investors Over Time
+        active_investors_fig = go.Figure()
+        active_investors_fig.add_trace(make_trace(data["day"], data["numInvestors"], x_range=day_range, mode="lines", name="Active Investors"))
+        if "queuedRedemptions" in data:
+            active_investors_fig.add_trace(make_trace(data["day"], data["queuedRedemptions"], x_range=day_range, mode="lines", name="Queued Redemptions"))
+        active_investors_fig.update_layout(title="Active Investors Over Time", xaxis_title="Day", yaxis_title="Investors")
+
+        # Ownership Concentration
+        concentration_fig = go.Figure()
+        concentration_fig.add_trace(make_trace(data["day"], data["hhi"], x_range=day_range, mode="lines", name="HHI"))
+        concentration_fig.update_layout(title="Ownership Concentration (HHI)", xaxis_title="Day", yaxis_title="HHI")
+        figures = [total_investment_fig, active_investors_fig, concentration_fig]
+
+        # Fees Collected: management fee accrued daily, performance fee at lock expiries over the high-water mark
+        if "managementFees" in data:
+            fees_fig = go.Figure()
+            fees_fig.add_trace(make_trace(data["day"], data["managementFees"].cumsum(), x_range=day_range, mode="lines", name="Management Fees"))
+            fees_fig.add_trace(make_trace(data["day"], data["performanceFees"].cumsum(), x_range=day_range, mode="lines", name="Performance Fees"))
+            fees_fig.update_layout(title="Cumulative Fees Collected", xaxis_title="Day", yaxis_title="Fees")
+            figures.append(fees_fig)
+        stage['payload'] = figures
+
+    with timer.stage('render_figures'):
+        for fig in figures:
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Investor Ownership Percentages: top holders plus an "others" band
+    if ownership is not None:
+        with timer.stage('ownership_figure') as stage:
+            investor_ownership_fig = top_holders_figure(
+                ownership["day"], ownership["topInvestor"], ownership["topPct"], top_n=top_n, day_range=day_range
+            )
+            stage['payload'] = investor_ownership_fig
+        with timer.stage('render_ownership_figure'):
+            st.plotly_chart(investor_ownership_fig, use_container_width=True)
 
 def main():
     st.title("Investment Visualization")
 
+    # Per-stage timings, logged on every rerun and optionally shown in the sidebar
+    debug = st.sidebar.checkbox("Performance Panel", value=False)
+    timer = StageTimer('investment_visualization', trace_memory=debug)
+    try:
+        render(timer)
+    finally:
+        timer.emit()
+    if debug:
+        debug_panel(timer)
+
+def render(timer):
+    """Widgets, results and charts of one rerun, timed stage by stage"""
     # Allow the user to adjust the key parameters
     st.sidebar.header("Simulation Parameters")
     investmentRange["min"] = st.sidebar.number_input("Minimum Investment", min_value=1000, max_value=500000, value=10000, step=1000)
     investmentRange["max"] = st.sidebar.number_input("Maximum Investment", min_value=1000, max_value=500000, value=100000, step=1000)
     lock_period_idx = st.sidebar.selectbox("Lock Period", [0, 1], format_func=lambda x: f"{lockPeriods[x]} days")
-    earlyWithdrawalPenalty = st.sidebar.number_input("Early Withdrawal Penalty (%)", min_value=0.0, max_value=1.0, value=0.1, step=0.01)
-    managementFee = st.sidebar.number_input("Management Fee (%)", min_value=0.0, max_value=1.0, value=0.03, step=0.01)
+    early_withdrawal_penalty = st.sidebar.number_input("Early Withdrawal Penalty (%)", min_value=0.0, max_value=1.0, value=0.1, step=0.01)
+    management_fee = st.sidebar.number_input("Management Fee (%)", min_value=0.0, max_value=1.0, value=0.03, step=0.01)
+    days = st.sidebar.number_input("Simulation Days", min_value=30, max_value=3650, value=365, step=30)
+    arrival_rate = st.sidebar.number_input("Daily Arrival Rate", min_value=0.0, max_value=1000.0, value=0.15, step=0.05)
+    annual_return = st.sidebar.number_input("Annual Fund Return", min_value=-0.9, max_value=5.0, value=0.0, step=0.05)
+
+    event_driven = st.sidebar.checkbox("Event-Driven Mode", value=False)
+    liquidity_limit = None
+    if event_driven and st.sidebar.checkbox("Limit Daily Redemptions", value=False):
+        liquidity_limit = st.sidebar.number_input("Daily Liquidity (% of Fund)", min_value=0.0, max_value=1.0, value=0.02, step=0.01)
 
     # Simulate the investment data
-    data = simulate_investment_data()
+    data, ownership = simulate_investment_data(
+        days=days,
+        arrival_rate=arrival_rate,
+        early_withdrawal_penalty=early_withdrawal_penalty,
+        management_fee=management_fee,
+        event_driven=event_driven,
+        liquidity_limit=liquidity_limit,
+        annual_return=annual_return,
+        timer=timer
+    )
+
+    # Long horizons are drawn downsampled; the visible window is re-rendered at full resolution
+    day_range = None
+    if len(data) > MAX_POINTS:
+        day_range = st.slider("Visible Days", min_value=0, max_value=len(data) - 1, value=(0, len(data) - 1))
+    top_n = st.sidebar.number_input("Investors Shown", min_value=1, max_value=maxInvestorsShown, value=20, step=1)
 
     # Plot the investment charts
-    plot_investment_charts(data)
+    plot_investment_charts(data, ownership, day_range=day_range, top_n=top_n, timer=timer)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+"""Per-deposit lot ledger: every contribution locked, compounded and charged on its own.
+
+The initial capital and every periodic saving open a lot with its own amount,
+entry week and lock expiry. The performance fee crystallizes on each lot when
+its lock expires, on the gain over the amount and at the tier of the lot's own
+return; the net value left becomes the lot's high-water mark, and later gains
+over it accrue the fee again. With ``lock_delays_returns`` (simulator.py) each
+lot compounds only from its own expiry instead of the whole balance waiting for
+the first lock.
+
+Rates are constant per scenario, so the state of every lot at any week is a
+closed form of its entry and expiry. Lots expire in entry order, so the liquid
+and locked balances of every week come from prefix sums over the lots and no
+week is ever stepped through.
+"""
+import numpy as np
+
+from fee_engine import DEFAULT_SCHEDULE, performance_fee_rates
+from scenario_engine import SCENARIO_PRESETS, WEEKS_PER_PERIOD, weekly_rates, lock_weeks
+
+# 20 bytes per lot: multi-year weekly savers hold hundreds of lots each across the whole book
+LOT_DTYPE = np.dtype([('client', 'i4'), ('amount', 'f8'), ('entry', 'i4'), ('expiry', 'i4')])
+
+# Lots of the book evaluated at once; bounds the (rates x lots) temporaries and keeps them in cache
+CHUNK_LOTS = 100_000
+
+
+def open_lots(initial_capital, periodic_savings, periods, lock_period, savings_frequency):
+    """Lots of every client, grouped by client in entry order.
+
+    The initial capital enters at week 0 and saving k at week
+    rint(k * weeks per period), as long as it falls inside the horizon of
+    rint(periods * weeks per period) weeks. Clients without savings hold one lot.
+    """
+    factor = np.array([WEEKS_PER_PERIOD.get(f, 1) for f in np.atleast_1d(savings_frequency)])
+    capital, savings, periods, lock, factor = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(initial_capital, dtype=float)),
+        np.asarray(periodic_savings, dtype=float),
+        np.asarray(periods, dtype=int),
+        np.asarray(lock_period, dtype=int),
+        factor
+    )
+    weeks = np.rint(periods * factor).astype(int)
+
+    # Last saving k with rint(k * factor) <= weeks - 1, corrected for rounding ties
+    n_savings = np.ceil((weeks - 0.5) / factor).astype(int) - 1
+    n_savings -= np.rint(n_savings * factor) > weeks - 1
+    n_savings += np.rint((n_savings + 1) * factor) <= weeks - 1
+    n_savings = np.where(savings > 0, np.maximum(n_savings, 0), 0)
+
+    counts = n_savings + 1
+    client = np.repeat(np.arange(counts.size), counts)
+    k = np.arange(client.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    lots = np.empty(client.size, dtype=LOT_DTYPE)
+    lots['client'] = client
+    lots['amount'] = np.where(k == 0, capital[client], savings[client])
+    lots['entry'] = np.rint(k * factor[client])
+    lots['expiry'] = lots['entry'] + lock_weeks(lock)[client]
+    return lots
+
+
+def _fee(value, basis, lock_period, fee_schedule):
+    """Performance fee on the gain of value over basis, at the tier of that return"""
+    gain = value - basis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_pct = np.where(basis > 0, gain / basis * 100, 0.0)
+    return performance_fee_rates(return_pct, lock_period, fee_schedule) * np.maximum(gain, 0)
+
+
+def lot_state(lots, step, annual_rates, lock_period, lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """State of every lot at week ``step`` (a scalar or one per lot) for every rate.
+
+    ``lock_period`` is in months, a scalar or one per lot. Lots compound
+    weekly from the week after entry, or from their expiry with
+    ``lock_delays_returns``. Returns arrays of shape (rates, lots): the gross
+    'value', the 'high_water' mark, the crystallized 'fee_paid', the
+    'accrued_fee' on gains over the mark and the 'net_value' after it, plus
+    per lot whether it 'is_locked' (unopened lots are neither).
+    """
+    log_growth = np.log1p(weekly_rates(np.atleast_1d(annual_rates)))[:, None]
+    amount, entry, expiry = lots['amount'], lots['entry'], lots['expiry']
+    first = np.maximum(expiry, entry + 1) if lock_delays_returns else entry + 1
+
+    # The fee crystallizes at expiry, after that week's growth
+    at_expiry = amount * np.exp(log_growth * np.maximum(expiry - first + 1, 0))
+    crystallized = expiry <= step
+    fee_paid = np.where(crystallized, _fee(at_expiry, amount, lock_period, fee_schedule), 0.0)
+    high_water = np.where(crystallized, at_expiry - fee_paid, amount)
+
+    opened = entry <= step
+    value = np.where(
+        crystallized,
+        high_water * np.exp(log_growth * (step - expiry)),
+        amount * np.exp(log_growth * np.maximum(step - first + 1, 0))
+    )
+    value = np.where(opened, value, 0.0)
+    accrued_fee = _fee(value, high_water, lock_period, fee_schedule)
+    return {
+        'value': value,
+        'high_water': high_water,
+        'fee_paid': fee_paid,
+        'accrued_fee': accrued_fee,
+        'net_value': value - accrued_fee,
+        'is_locked': opened & ~crystallized
+    }
+
+
+def _window(x, lo, hi):
+    """Sums of x over the lot ranges lo:hi along the last axis.
+
+    Discounted terms shrink with the entry week, so sums are taken from the
+    end: the recent lots of a window are not lost against the early ones.
+    """
+    suffix = np.concatenate([np.cumsum(x[..., ::-1], axis=-1)[..., ::-1], np.zeros(x.shape[:-1] + (1,))], axis=-1)
+    return suffix[..., lo] - suffix[..., hi]
+
+
+def ledger_paths(lots, weeks, annual_rates, lock_period, lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Liquid and locked balances, deposits and fees paid at every week of one client's lots.
+
+    At week t the opened lots are those with entry <= t and the expired ones
+    a prefix of them. Liquid lots grow from their high-water mark at expiry
+    and locked ones from their amount (not at all with
+    ``lock_delays_returns``), so both balances are window sums of per-lot
+    terms discounted to week 0. Returns 'liquid', 'locked' and cumulative
+    'fees_paid' of shape (rates, weeks), and 'deposits' of shape (weeks,).
+    """
+    log_growth = np.log1p(weekly_rates(np.atleast_1d(annual_rates)))[:, None]
+    t = np.arange(weeks)
+    opened = np.searchsorted(lots['entry'], t, side='right')
+    expired = np.searchsorted(lots['expiry'], t, side='right')
+    zeros = np.zeros_like(t)
+
+    at_expiry = lot_state(lots, lots['expiry'], annual_rates, lock_period, lock_delays_returns, fee_schedule)
+    liquid = np.exp(log_growth * t) * _window(at_expiry['high_water'] * np.exp(-log_growth * lots['expiry']),
+                                              zeros, expired)
+    if lock_delays_returns:
+        locked = np.broadcast_to(_window(lots['amount'], expired, opened), liquid.shape)
+    else:
+        locked = np.exp(log_growth * t) * _window(lots['amount'] * np.exp(-log_growth * lots['entry']),
+                                                  expired, opened)
+    return {
+        'liquid': liquid,
+        'locked': locked,
+        'fees_paid': _window(at_expiry['fee_paid'], zeros, expired),
+        'deposits': _window(lots['amount'], zeros, opened)
+    }
+
+
+def lot_ledger(initial_capital, periodic_savings, periods, lock_period, savings_frequency, annual_rates,
+               lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Ledger of one client: ledger_paths over the horizon and every lot's lot_state at its last week"""
+    lots = open_lots(initial_capital, periodic_savings, periods, lock_period, savings_frequency)
+    weeks = int(round(periods * WEEKS_PER_PERIOD.get(savings_frequency, 1)))
+    results = ledger_paths(lots, weeks, annual_rates, lock_period, lock_delays_returns, fee_schedule)
+    results.update(lot_state(lots, weeks - 1, annual_rates, lock_period, lock_delays_returns, fee_schedule))
+    results['lots'] = lots
+    return results
+
+
+def ledger_results(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                   preset='streakbull', include_savings=True):
+    """lot_ledger for every scenario of a preset; takes the same inputs as scenario_results"""
+    config = SCENARIO_PRESETS[preset]
+    results = lot_ledger(
+        initial_capital,
+        periodic_savings if include_savings else 0,
+        periods,
+        lock_period,
+        savings_frequency,
+        list(config['rates'].values()),
+        config['lock_delays_returns'],
+        config['fee_schedule']
+    )
+    results['scenarios'] = list(config['rates'])
+    return results
+
+
+def ledger_totals(initial_capital, periodic_savings, periods, lock_period, savings_frequency, annual_rates,
+                  lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Ledger totals of many clients at each one's last week; shape (rates, clients).
+
+    Returns the 'liquid' and 'locked' balances, 'fees_paid', 'accrued_fee',
+    'net_value' and the number of 'lots' per client. Clients are processed
+    in chunks of about CHUNK_LOTS lots.
+    """
+    factor = np.array([WEEKS_PER_PERIOD.get(f, 1) for f in np.atleast_1d(savings_frequency)])
+    capital, savings, periods, lock, frequency, factor = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(initial_capital, dtype=float)),
+        np.asarray(periodic_savings, dtype=float),
+        np.asarray(periods, dtype=int),
+        np.asarray(lock_period, dtype=int),
+        np.atleast_1d(savings_frequency),
+        factor
+    )
+    rates = np.atleast_1d(annual_rates)
+    weeks = np.rint(periods * factor).astype(int)
+    n = capital.size
+    totals = {name: np.zeros((rates.size, n)) for name in ('liquid', 'locked', 'fees_paid', 'accrued_fee', 'net_value')}
+    totals['lots'] = np.zeros(n, dtype=int)
+
+    # Upper bound on each client's lots, to size the chunks
+    lot_bound = np.cumsum(weeks / factor + 2)
+    start = 0
+    while start < n:
+        done = lot_bound[start - 1] if start else 0
+        stop = max(int(np.searchsorted(lot_bound, done + CHUNK_LOTS, side='right')), start + 1)
+        chunk = slice(start, stop)
+        lots = open_lots(capital[chunk], savings[chunk], periods[chunk], lock[chunk], frequency[chunk])
+        client = lots['client']
+        state = lot_state(lots, weeks[chunk][client] - 1, rates, lock[chunk][client], lock_delays_returns,
+                          fee_schedule)
+        size = stop - start
+        liquid = np.where(state['is_locked'], 0.0, state['value'])
+        per_lot = {
+            'liquid': liquid,
+            'locked': state['value'] - liquid,
+            'fees_paid': state['fee_paid'],
+            'accrued_fee': state['accrued_fee'],
+            'net_value': state['net_value']
+        }
+        for name, values in per_lot.items():
+            for i in range(rates.size):
+                totals[name][i, chunk] = np.bincount(client, values[i], size)
+        totals['lots'][chunk] = np.bincount(client, minlength=size)
+        start = stop
+    return totals
@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from drawdown import drawdown_analytics
+from scenario_engine import simulate_paths, weekly_rates
+
+# StreakBull daily standard deviation (2021-2024) used to calibrate the stochastic mode
+DAILY_VOLATILITY = 0.0073
+HISTORICAL_MAX_DRAWDOWN = -15.1
+TRADING_DAYS = 252
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Paths x weeks simulated at once; bounds memory regardless of the number of paths
+CHUNK_ELEMENTS = 2_000_000
+
+# Worker processes used by default; 1 runs in-process
+WORKERS = int(os.environ.get('STREAKBULL_MC_WORKERS', 1))
+
+# Histogram used to read percentiles out of each chunk, in standard deviations of log value
+HISTOGRAM_BINS = 2000
+HISTOGRAM_RANGE = 8.0
+
+# Maximum drawdown histogram, in bins of 0.1 percentage points
+DRAWDOWN_BINS = 1000
+
+
+def weekly_volatility(daily_volatility=DAILY_VOLATILITY):
+    """Scale a daily standard deviation to weekly log returns"""
+    return daily_volatility * np.sqrt(TRADING_DAYS / 52)
+
+
+def simulate_value_paths(rng, n_paths, initial_capital, savings_weekly, weeks, annual_rate,
+                         lock_weeks=0, daily_volatility=DAILY_VOLATILITY):
+    """Simulate random value paths; returns an array of shape (n_paths, weeks).
+
+    Weekly growth is log-normal with mean equal to the scenario's weekly rate.
+    Before ``lock_weeks`` only savings are accumulated, as in simulate_paths.
+    """
+    sigma = weekly_volatility(daily_volatility)
+    mu = np.log1p(weekly_rates(annual_rate)) - sigma ** 2 / 2
+
+    log_growth = rng.normal(mu, sigma, size=(n_paths, weeks))
+    log_growth[:, 0] = 0
+    log_growth[:, 1:max(int(lock_weeks), 1)] = 0
+    wealth = np.exp(np.cumsum(log_growth, axis=1, out=log_growth))
+
+    # V_t = W_t * (C + s * sum_{k<=t} 1 / W_k), the closed form of V_t = V_{t-1} * g_t + s
+    discounted = np.cumsum(1 / wealth[:, 1:], axis=1)
+    values = wealth
+    values[:, 1:] *= initial_capital + savings_weekly * discounted
+    values[:, 0] *= initial_capital
+    return values
+
+
+def _band_scale(weeks, lock_weeks, daily_volatility):
+    """Expected spread of log value per week, used to standardise the histogram"""
+    compounding_weeks = np.maximum(np.arange(weeks) - max(int(lock_weeks), 1) + 1, 1)
+    return weekly_volatility(daily_volatility) * np.sqrt(compounding_weeks)
+
+
+def _histogram_counts(values, expected, scale):
+    """Count standardised log values per week into a (weeks, bins) histogram"""
+    weeks = values.shape[1]
+    z = np.log(values / expected) / scale
+    bins = ((z + HISTOGRAM_RANGE) / (2 * HISTOGRAM_RANGE) * HISTOGRAM_BINS).astype(np.int64)
+    np.clip(bins, 0, HISTOGRAM_BINS - 1, out=bins)
+    bins += np.arange(weeks) * HISTOGRAM_BINS
+    return np.bincount(bins.ravel(), minlength=weeks * HISTOGRAM_BINS).reshape(weeks, HISTOGRAM_BINS)
+
+
+def _histogram_percentiles(counts, expected, scale, percentiles):
+    """Interpolate percentiles out of per-week histograms"""
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1:]
+    edges = np.linspace(-HISTOGRAM_RANGE, HISTOGRAM_RANGE, HISTOGRAM_BINS + 1)
+    rows = np.arange(counts.shape[0])
+
+    bands = []
+    for q in percentiles:
+        target = total[:, 0] * q / 100
+        idx = np.minimum((cumulative < target[:, None]).sum(axis=1), HISTOGRAM_BINS - 1)
+        before = np.where(idx > 0, cumulative[rows, idx - 1], 0)
+        in_bin = np.maximum(counts[rows, idx], 1)
+        fraction = np.clip((target - before) / in_bin, 0, 1)
+        z = edges[idx] + fraction * (edges[1] - edges[0])
+        bands.append(expected * np.exp(z * scale))
+    return np.array(bands)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(workers):
+    """Return the process pool shared by every caller (and Streamlit session) in this process"""
+    with _executors_lock:
+        if workers not in _executors:
+            _executors[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executors[workers]
+
+
+def _simulate_block(seed_sequence, n_paths, initial_capital, savings_weekly, weeks, annual_rate,
+                    lock_weeks, daily_volatility, expected, scale, final_deposits):
+    """Simulate one block of paths from its own RNG stream and reduce it to partial results"""
+    rng = np.random.default_rng(seed_sequence)
+    values = simulate_value_paths(
+        rng, n_paths, initial_capital, savings_weekly, weeks, annual_rate, lock_weeks, daily_volatility
+    )
+    max_drawdown = drawdown_analytics(values)['max_drawdown']
+    drawdown_bins = np.minimum((max_drawdown * DRAWDOWN_BINS / 100).astype(np.int64), DRAWDOWN_BINS - 1)
+    return (
+        _histogram_counts(values, expected, scale),
+        np.bincount(drawdown_bins, minlength=DRAWDOWN_BINS),
+        int(np.count_nonzero(values[:, -1] < final_deposits)),
+        float(values[:, -1].sum())
+    )
+
+
+def run_monte_carlo(initial_capital, savings_weekly, weeks, annual_rate, n_paths, lock_weeks=0,
+                    daily_volatility=DAILY_VOLATILITY, seed=None, percentiles=PERCENTILES,
+                    workers=None):
+    """Run the stochastic mode for one scenario in bounded-memory blocks.
+
+    Paths are split into blocks whose size depends only on the horizon, and
+    every block draws from its own child of ``SeedSequence(seed)``. Blocks run
+    on ``workers`` processes (default ``WORKERS``) and are merged in block
+    order, so a given seed yields bit-identical output for any worker count.
+
+    Returns percentile bands per week, the probability of ending below total
+    deposits, the mean final value and the distribution of maximum drawdowns
+    (including the share of paths deeper than ``HISTORICAL_MAX_DRAWDOWN``)
+    across ``n_paths`` random paths.
+    """
+    workers = WORKERS if workers is None else workers
+    expected = simulate_paths(initial_capital, savings_weekly, weeks, annual_rate, lock_weeks)[0]
+    scale = _band_scale(weeks, lock_weeks, daily_volatility)
+    final_deposits = initial_capital + savings_weekly * (weeks - 1)
+
+    block_paths = max(CHUNK_ELEMENTS // weeks, 1)
+    block_sizes = [min(block_paths, n_paths - start) for start in range(0, n_paths, block_paths)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    args = (initial_capital, savings_weekly, weeks, annual_rate, lock_weeks, daily_volatility,
+            expected, scale, final_deposits)
+
+    if workers > 1 and len(block_sizes) > 1:
+        executor = get_executor(workers)
+        futures = [executor.submit(_simulate_block, ss, n, *args) for ss, n in zip(seed_sequences, block_sizes)]
+        partials = (future.result() for future in futures)
+    else:
+        partials = (_simulate_block(ss, n, *args) for ss, n in zip(seed_sequences, block_sizes))
+
+    counts = np.zeros((weeks, HISTOGRAM_BINS), dtype=np.int64)
+    drawdown_counts = np.zeros(DRAWDOWN_BINS, dtype=np.int64)
+    below_deposits = 0
+    final_total = 0.0
+    for block_counts, block_drawdowns, block_below, block_total in partials:
+        counts += block_counts
+        drawdown_counts += block_drawdowns
+        below_deposits += block_below
+        final_total += block_total
+
+    bands = _histogram_percentiles(counts, expected, scale, percentiles)
+
+    # Upper edge of the bin holding each percentile of the maximum drawdown
+    drawdown_cdf = np.cumsum(drawdown_counts) / n_paths
+    drawdown_percentiles = {
+        q: (np.searchsorted(drawdown_cdf, q / 100) + 1) * 100 / DRAWDOWN_BINS
+        for q in percentiles
+    }
+    historical_bin = int(-HISTORICAL_MAX_DRAWDOWN * DRAWDOWN_BINS / 100)
+    return {
+        'percentiles': dict(zip(percentiles, bands)),
+        'expected': expected,
+        'prob_below_deposits': below_deposits / n_paths,
+        'mean_final_value': final_total / n_paths,
+        'max_drawdown_percentiles': drawdown_percentiles,
+        'prob_exceeds_drawdown': drawdown_counts[historical_bin:].sum() / n_paths,
+        'n_paths': n_paths,
+        'seed': seed
+    }
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+from result_cache import estimate_size
+
+# JSON lines, one per stage, are appended here when set
+METRICS_FILE = os.environ.get('STREAKBULL_METRICS_FILE')
+
+logger = logging.getLogger('streakbull.perf')
+_file_lock = threading.Lock()
+
+# tracemalloc is process-wide: it is started by the first tracing timer and stopped with the last one
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_owns_tracing = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _owns_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _owns_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+class StageTimer:
+    """Per-stage timings for one rerun of a Streamlit script.
+
+    Each stage records its wall time, the net change in allocated Python
+    memory blocks and, when a payload is attached, its estimated size. With
+    ``trace_memory`` each stage's peak traced memory above its starting point
+    is also recorded (tracemalloc slows allocation, so keep it for the debug
+    panel). Tracing stays on until the last tracing timer is emitted or
+    closed. The peak is process-wide, so while several sessions trace at once
+    each stage's peak_bytes is approximate: it includes the other sessions'
+    allocations and their stages reset it.
+    """
+
+    def __init__(self, app, trace_memory=False):
+        self.app = app
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages = []
+        self.trace_memory = trace_memory
+        self._tracing = trace_memory
+        if trace_memory:
+            _acquire_tracing()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block; set ``record['payload']`` to report its size"""
+        record = {'stage': name}
+        if self._tracing:
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['allocated_blocks'] = sys.getallocatedblocks() - blocks
+            if 'payload' in record:
+                record['payload_bytes'] = estimate_size(record.pop('payload'))
+            if self._tracing:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1] - traced
+            self.stages.append(record)
+
+    def total_seconds(self):
+        return sum(record['seconds'] for record in self.stages)
+
+    def close(self):
+        """Release this timer's hold on tracemalloc; safe to call more than once"""
+        if self._tracing:
+            self._tracing = False
+            _release_tracing()
+
+    def emit(self, path=METRICS_FILE):
+        """Log one structured line per stage, append them to the metrics file and close the timer"""
+        try:
+            lines = [
+                json.dumps(dict(record, app=self.app, run_id=self.run_id, timestamp=time.time()))
+                for record in self.stages
+            ]
+            for line in lines:
+                logger.info(line)
+            if path:
+                with _file_lock, open(path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(line + '\n' for line in lines))
+        finally:
+            self.close()
+
+
+def debug_panel(timer, title="Performance"):
+    """Show the stage timings in the Streamlit sidebar, slowest stage first"""
+    import streamlit as st
+
+    total = timer.total_seconds()
+    rows = [
+        {
+            'stage': record['stage'],
+            'ms': round(record['seconds'] * 1000, 1),
+            'share': f"{record['seconds'] / total:.0%}" if total else '-',
+            'blocks': record['allocated_blocks'],
+            'payload_kb': round(record['payload_bytes'] / 1024, 1) if 'payload_bytes' in record else None,
+            'peak_kb': round(record['peak_bytes'] / 1024, 1) if 'peak_bytes' in record else None
+        }
+        for record in sorted(timer.stages, key=lambda record: record['seconds'], reverse=True)
+    ]
+    with st.sidebar.expander(title, expanded=True):
+        st.caption(f"Run {timer.run_id} · {total * 1000:.1f} ms")
+        st.dataframe(rows, hide_index=True)
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+# Ceiling for the process-wide cache shared by every Streamlit session
+MAX_ENTRIES = int(os.environ.get('STREAKBULL_CACHE_ENTRIES', 512))
+MAX_BYTES = int(os.environ.get('STREAKBULL_CACHE_MB', 256)) * 2 ** 20
+
+
+def estimate_size(value):
+    """Rough memory footprint of a cached value in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, 'as_dict'):
+        return estimate_size(value.as_dict())
+    if hasattr(value, 'to_plotly_json'):
+        return estimate_size(value.to_plotly_json())
+    return sys.getsizeof(value)
+
+
+class BoundedCache:
+    """Thread-safe LRU cache bounded by entry count and estimated memory"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def scenario_key(initial_capital, periodic_savings, periods, lock_period, savings_frequency, include_savings=True):
+    """Normalized cache key for one set of scenario inputs"""
+    if not include_savings:
+        periodic_savings = 0
+    return (
+        float(initial_capital),
+        float(periodic_savings),
+        int(periods),
+        int(lock_period),
+        str(savings_frequency),
+        bool(include_savings),
+        # Date axes start today, so results expire at midnight
+        date.today().isoformat()
+    )
+
+
+# Shared by scenario results and the figures built from them
+RESULT_CACHE = BoundedCache()
@@ -0,0 +1,459 @@
+import os
+from datetime import date
+
+import numpy as np
+
+from fee_engine import DEFAULT_SCHEDULE, apply_performance_fees, performance_fee_rates
+
+# Calendar weeks per savings period (52 weeks a year)
+WEEKS_PER_MONTH = 52 / 12
+WEEKS_PER_PERIOD = {
+    'Semanal': 1,
+    'Mensual': WEEKS_PER_MONTH,
+    'Trimestral': 13
+}
+
+# Calendar step between deposits of each savings frequency as (count, datetime64 unit)
+FREQUENCY_STEPS = {
+    'Semanal': (7, 'D'),
+    'Mensual': (1, 'M'),
+    'Trimestral': (3, 'M')
+}
+
+# Step resolutions of the engine and the views aggregated from them
+DAYS_PER_YEAR = 365.25
+PERIODS_PER_YEAR = {'D': DAYS_PER_YEAR, 'W': 52, 'M': 12, 'Q': 4}
+
+# Scenario rates and fee rules behind each simulator; simulator.py is 'legacy', simulator1.0.py 'streakbull'
+SCENARIO_PRESETS = {
+    'legacy': {
+        'rates': {
+            'pessimistic': 0.1857,  # 1X QQQ 2024
+            'moderate': 0.2950,     # 1X StreakBull 2024
+            'optimistic': 0.5900    # 2X StreakBull 2024
+        },
+        'fee_schedule': 'legacy',
+        'lock_delays_returns': True
+    },
+    'streakbull': {
+        'rates': {
+            'pessimistic': 0.1857,  # QQQ baseline
+            'moderate': 0.2950,     # StreakBull baseline
+            'optimistic': 0.6500    # Enhanced StreakBull (updated to 65%)
+        },
+        'fee_schedule': 'streakbull',
+        'lock_delays_returns': False
+    }
+}
+
+
+# Float type of the result paths; float32 halves the memory of every cached session
+RESULT_DTYPE = np.dtype(os.environ.get('STREAKBULL_RESULT_DTYPE', 'float64'))
+
+# Inputs differentiated by final_value_sensitivities, in column order
+SENSITIVITY_INPUTS = ('initial_capital', 'periodic_savings', 'annual_rate', 'periods', 'lock_period')
+
+
+def weekly_rates(annual_rates):
+    """Convert annual rates to compounded weekly rates"""
+    return (1 + np.asarray(annual_rates, dtype=float)) ** (1 / 52) - 1
+
+
+def to_weeks(periods, periodic_savings, savings_frequency):
+    """Convert a horizon in savings periods to whole calendar weeks and weekly savings"""
+    factor = WEEKS_PER_PERIOD.get(savings_frequency, 1)
+    return int(round(periods * factor)), periodic_savings / factor
+
+
+def lock_weeks(lock_months):
+    """Lock period in whole calendar weeks"""
+    return np.rint(np.asarray(lock_months) * WEEKS_PER_MONTH).astype(int)
+
+
+def add_months(start, months):
+    """Dates ``months`` calendar months after start, keeping the day of month (clipped to month end)"""
+    start = np.datetime64(start, 'D')
+    first = start.astype('datetime64[M]')
+    day = start - first.astype('datetime64[D]')
+    target = first + np.asarray(months)
+    month_days = (target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')
+    return target.astype('datetime64[D]') + np.minimum(day, month_days - np.timedelta64(1, 'D'))
+
+
+def date_axis(start, steps, resolution='W'):
+    """datetime64[D] axis of ``steps`` points spaced by a day, week, month or quarter"""
+    start = np.datetime64(start, 'D')
+    if resolution == 'D':
+        return start + np.arange(steps)
+    if resolution == 'W':
+        return start + 7 * np.arange(steps)
+    return add_months(start, np.arange(steps) * (3 if resolution == 'Q' else 1))
+
+
+def period_ends(dates, resolution):
+    """Indices of the first point and of the last point of every period of a finer axis"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if resolution == 'D' or dates.size == 0:
+        return np.arange(dates.size)
+    if resolution == 'W':
+        key = (dates - dates[0]).astype(np.int64) // 7
+    else:
+        key = dates.astype('datetime64[M]').astype(np.int64) // (3 if resolution == 'Q' else 1)
+    ends = np.append(np.flatnonzero(np.diff(key)), dates.size - 1)
+    return np.union1d([0], ends)
+
+
+def annuity_factor(rate, n):
+    """Future value of one unit saved per week for n weeks: ((1 + r)^n - 1) / r"""
+    rate, n = np.broadcast_arrays(np.asarray(rate, dtype=float), np.asarray(n, dtype=float))
+    growth = np.expm1(n * np.log1p(rate))
+    return np.divide(growth, rate, out=n.copy(), where=rate != 0)
+
+
+def _project(initial_capital, savings_weekly, t, rates, start):
+    """Balance at week t for weekly rates that start compounding at week ``start``"""
+    compounding_weeks = np.maximum(t - start + 1, 0)
+
+    # Masked pre-lock segment: a straight line of deposits that freezes at the lock
+    base = initial_capital + savings_weekly * np.minimum(t, start - 1)
+
+    growth = np.exp(compounding_weeks * np.log1p(rates))
+    return base * growth + savings_weekly * annuity_factor(rates, compounding_weeks)
+
+
+def simulate_paths(initial_capital, savings_weekly, weeks, annual_rates, lock_weeks=0):
+    """Project one path per annual rate with the geometric-series closed form.
+
+    Week 0 holds the initial capital. Before ``lock_weeks`` only savings are
+    accumulated; from then on the balance compounds weekly and savings are added
+    at the end of each week. Returns an array of shape (len(annual_rates), weeks).
+    """
+    rates = weekly_rates(np.atleast_1d(annual_rates))[:, None]
+
+    # First week that compounds; week 0 never does
+    start = max(int(lock_weeks), 1)
+    return _project(initial_capital, savings_weekly, np.arange(weeks), rates, start)
+
+
+def cumulative_deposits(initial_capital, savings_weekly, weeks):
+    """Deposits made up to each week, starting with the initial capital"""
+    return initial_capital + savings_weekly * np.arange(weeks, dtype=float)
+
+
+def simulate_calendar(initial_capital, periodic_savings, periods, savings_frequency, annual_rates,
+                      lock_months=0, start=None):
+    """Project one path per annual rate at daily granularity on the real calendar.
+
+    Savings land on their calendar dates (every 7 days, or on the start's day
+    of month every month or quarter) for ``periods`` periods after ``start``
+    (default today). Balances compound daily at (1 + rate)^(1 / 365.25) from
+    ``lock_months`` after start; before that only deposits accumulate. The
+    balance is the cumulative sum of deposits discounted to the start, grown
+    back to each day. Returns the daily 'dates', cumulative 'deposits' and
+    'paths' of shape (len(annual_rates), days).
+    """
+    start = np.datetime64(date.today() if start is None else start, 'D')
+    count, unit = FREQUENCY_STEPS.get(savings_frequency, (7, 'D'))
+    steps = np.arange(1, periods + 1) * count
+    schedule = start + steps if unit == 'D' else add_months(start, steps)
+    end = schedule[-1] if periods > 0 else start
+    dates = np.arange(start, end + 1, dtype='datetime64[D]')
+
+    flows = np.zeros(dates.size)
+    flows[0] = initial_capital
+    np.add.at(flows, (schedule - start).astype(np.int64), periodic_savings)
+
+    lock_day = (add_months(start, lock_months) - start).astype(np.int64)
+    years = np.maximum(np.arange(dates.size) - lock_day, 0) / DAYS_PER_YEAR
+    log_growth = np.log1p(np.atleast_1d(np.asarray(annual_rates, dtype=float)))[:, None] * years
+    paths = np.exp(log_growth) * np.cumsum(flows * np.exp(-log_growth), axis=-1)
+    return {'dates': dates, 'deposits': np.cumsum(flows), 'paths': paths}
+
+
+def final_return_pct(paths, deposits):
+    """Return (%) of each path's final value over the final deposits"""
+    return (paths[..., -1] - deposits[-1]) / deposits[-1] * 100
+
+
+class ScenarioResults:
+    """Scenario output over one contiguous block of paths.
+
+    Row 0 of ``values`` holds the cumulative deposits and row i + 1 the path
+    of scenario ``names[i]``, along the datetime64 ``dates``. ``returns`` and
+    ``fees`` are arrays in ``names`` order, and ``drawdowns`` holds
+    drawdown_analytics output once a simulator attaches it. Indexing by
+    'savings' or a scenario name returns a view of its row, so charts and
+    exporters read the block without copying it.
+    """
+    __slots__ = ('dates', 'values', 'names', 'returns', 'fees', 'resolution', 'sensitivities', 'drawdowns')
+
+    def __init__(self, dates, values, names, returns, fees, resolution, sensitivities=None, drawdowns=None):
+        self.dates = dates
+        self.values = values
+        self.names = tuple(names)
+        self.returns = returns
+        self.fees = fees
+        self.resolution = resolution
+        self.sensitivities = sensitivities
+        self.drawdowns = drawdowns
+
+    def __getitem__(self, key):
+        if key == 'savings':
+            return self.values[0]
+        if key in self.names:
+            return self.values[1 + self.names.index(key)]
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    @property
+    def paths(self):
+        """Scenario paths, shape (scenarios, steps)"""
+        return self.values[1:]
+
+    def take(self, steps, resolution):
+        """Results at a subset of the steps, sampled in one copy of the block"""
+        drawdowns = self.drawdowns
+        if drawdowns is not None:
+            drawdowns = dict(drawdowns, underwater=drawdowns['underwater'][:, steps])
+        return ScenarioResults(self.dates[steps], self.values[:, steps], self.names, self.returns, self.fees,
+                               resolution, self.sensitivities, drawdowns)
+
+    def frame(self):
+        """pandas DataFrame over the same memory: one column per row of the block, indexed by date"""
+        import pandas as pd
+
+        return pd.DataFrame(self.values.T, index=pd.Index(self.dates, name='date'),
+                            columns=['savings', *self.names], copy=False)
+
+    def as_dict(self):
+        """The scenario_results layout as a plain dict of views, for JSON and size estimates"""
+        results = {'dates': self.dates, 'savings': self.values[0]}
+        results.update(zip(self.names, self.paths))
+        results['returns'] = dict(zip(self.names, self.returns.tolist()))
+        results['fees'] = dict(zip(self.names, self.fees.tolist()))
+        results['resolution'] = self.resolution
+        results['sensitivities'] = self.sensitivities
+        if self.drawdowns is not None:
+            results['drawdowns'] = self.drawdowns
+        return results
+
+
+def scenario_results(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                     preset='streakbull', include_savings=True, resolution='W', start=None, dtype=RESULT_DTYPE):
+    """Paths, deposits, final returns and fee rates for every scenario of a preset.
+
+    The simulators' calculation without the UI. ``resolution`` is the step of
+    the engine: 'W' for the weekly closed form or 'D' for simulate_calendar.
+    Returns a ScenarioResults over a datetime64 axis from ``start`` (default
+    today), with the deposits and paths stored as ``dtype``. Use
+    resample_results for monthly or quarterly views.
+    """
+    config = SCENARIO_PRESETS[preset]
+    rates = config['rates']
+    start = np.datetime64(date.today() if start is None else start, 'D')
+    periodic_savings = periodic_savings if include_savings else 0
+
+    # All scenarios at once; with lock_delays_returns returns only compound after the lock period
+    lock_months = lock_period if config['lock_delays_returns'] else 0
+    if resolution == 'D':
+        calendar = simulate_calendar(initial_capital, periodic_savings, periods, savings_frequency,
+                                     list(rates.values()), lock_months, start)
+        dates, deposits, paths = calendar['dates'], calendar['deposits'], calendar['paths']
+    else:
+        weeks, savings_weekly = to_weeks(periods, periodic_savings, savings_frequency)
+        dates = date_axis(start, weeks, 'W')
+        deposits = cumulative_deposits(initial_capital, savings_weekly, weeks)
+        paths = simulate_paths(initial_capital, savings_weekly, weeks, list(rates.values()), lock_weeks(lock_months))
+
+    # Every scenario's fee with one tier lookup
+    returns = final_return_pct(paths, deposits)
+    fees = performance_fee_rates(returns, lock_period, schedule=config['fee_schedule'])
+
+    values = np.empty((len(rates) + 1, len(dates)), dtype=dtype)
+    values[0] = deposits
+    values[1:] = paths
+
+    # Partial derivatives for the tornado chart, from the same inputs in closed form
+    sensitivities = final_value_sensitivities(
+        initial_capital,
+        periodic_savings,
+        periods,
+        lock_period,
+        savings_frequency,
+        list(rates.values()),
+        config['lock_delays_returns'],
+        config['fee_schedule']
+    )
+    return ScenarioResults(dates, values, rates, returns, fees, 'D' if resolution == 'D' else 'W', sensitivities)
+
+
+def resample_results(results, resolution):
+    """View of scenario results at a coarser resolution, by end-of-period indexing (no recompute).
+
+    Every array running along 'dates' is sampled at the first point and the
+    last point of each period; other entries are passed through.
+    """
+    if PERIODS_PER_YEAR[resolution] >= PERIODS_PER_YEAR[results['resolution']]:
+        return results
+    n = len(results['dates'])
+    keep = period_ends(results['dates'], resolution)
+    if isinstance(results, ScenarioResults):
+        return results.take(keep, resolution)
+    view = {
+        key: value[..., keep] if isinstance(value, np.ndarray) and value.shape[-1:] == (n,) else value
+        for key, value in results.items()
+    }
+    view['resolution'] = resolution
+    return view
+
+
+def evaluate_grid(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                  annual_rates, lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Evaluate final values over the full parameter grid in one broadcasted pass.
+
+    Every argument is an axis (scalar or sequence). ``periods`` is counted in
+    units of each savings frequency, as in the simulators. With
+    ``lock_delays_returns`` returns only compound after the lock period, as in
+    simulator.py. Returns a dict with the axis names ('dims'), their labels
+    ('coords') and N-D arrays of final values, deposits, returns, fee rates
+    from ``fee_schedule`` and final values net of the performance fee.
+    """
+    coords = {
+        'annual_rate': np.atleast_1d(np.asarray(annual_rates, dtype=float)),
+        'initial_capital': np.atleast_1d(np.asarray(initial_capital, dtype=float)),
+        'periodic_savings': np.atleast_1d(np.asarray(periodic_savings, dtype=float)),
+        'periods': np.atleast_1d(np.asarray(periods, dtype=int)),
+        'lock_period': np.atleast_1d(np.asarray(lock_period, dtype=int)),
+        'savings_frequency': np.atleast_1d(np.asarray(savings_frequency))
+    }
+    dims = tuple(coords)
+    rate, capital, savings, n_periods, lock, factor = np.ix_(
+        weekly_rates(coords['annual_rate']),
+        coords['initial_capital'],
+        coords['periodic_savings'],
+        coords['periods'],
+        coords['lock_period'],
+        np.array([WEEKS_PER_PERIOD.get(f, 1) for f in coords['savings_frequency']])
+    )
+
+    weeks = np.rint(n_periods * factor).astype(int)
+    savings_weekly = savings / factor
+    start = np.maximum(lock_weeks(lock), 1) if lock_delays_returns else np.ones_like(lock)
+
+    final_value = _project(capital, savings_weekly, weeks - 1, rate, start)
+    deposits = np.broadcast_to(capital + savings_weekly * (weeks - 1), final_value.shape)
+    return_pct = (final_value - deposits) / deposits * 100
+    net_final_value, fee_rate = apply_performance_fees(final_value, deposits, lock, fee_schedule)
+
+    return {
+        'dims': dims,
+        'coords': coords,
+        'final_value': final_value,
+        'deposits': deposits,
+        'return_pct': return_pct,
+        'fee_rate': fee_rate,
+        'net_final_value': net_final_value
+    }
+
+
+def evaluate_rows(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                  annual_rates, lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Evaluate final values for rows of client parameters in one vectorized pass.
+
+    The row-wise counterpart of evaluate_grid: the five parameter arguments are
+    equal-length sequences, one entry per client, and every row is projected
+    at each of ``annual_rates``. Returns arrays of shape (len(annual_rates), rows)
+    for final values, returns, fee rates and net final values, plus the
+    per-row deposits and horizon in weeks.
+    """
+    capital = np.asarray(initial_capital, dtype=float)
+    lock = np.asarray(lock_period, dtype=int)
+    factor = np.array([WEEKS_PER_PERIOD.get(f, 1) for f in np.atleast_1d(savings_frequency)])
+    weeks = np.rint(np.asarray(periods, dtype=int) * factor).astype(int)
+    savings_weekly = np.asarray(periodic_savings, dtype=float) / factor
+    rate = weekly_rates(np.atleast_1d(annual_rates))[:, None]
+    start = np.maximum(lock_weeks(lock), 1) if lock_delays_returns else np.ones_like(lock)
+
+    final_value = _project(capital, savings_weekly, weeks - 1, rate, start)
+    deposits = capital + savings_weekly * (weeks - 1)
+    net_final_value, fee_rate = apply_performance_fees(final_value, deposits, lock, fee_schedule)
+    # Rows without deposits have no return (NaN)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_pct = (final_value - deposits) / deposits * 100
+
+    return {
+        'weeks': weeks,
+        'deposits': deposits,
+        'final_value': final_value,
+        'return_pct': return_pct,
+        'fee_rate': fee_rate,
+        'net_final_value': net_final_value
+    }
+
+
+def final_value_sensitivities(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                              annual_rates, lock_delays_returns=False, fee_schedule=DEFAULT_SCHEDULE):
+    """Final value and net-of-fee return with their partial derivatives, from the weekly closed form.
+
+    Differentiates _project at the last week with respect to every input of
+    SENSITIVITY_INPUTS: savings per period, annual rate, horizon in periods
+    and lock in months, the last two taken as continuous. The fee is held at
+    its current tier, so jumps between tiers (including the lock period's
+    choice of tiers) are not part of the derivatives. Returns 'final_value',
+    'deposits', 'net_return_pct' per rate and 'd_final_value' and
+    'd_net_return_pct' of shape (rates, inputs).
+    """
+    factor = WEEKS_PER_PERIOD.get(savings_frequency, 1)
+    annual_rates = np.atleast_1d(np.asarray(annual_rates, dtype=float))
+    rates = weekly_rates(annual_rates)
+    savings_weekly = periodic_savings / factor
+    t = int(round(periods * factor)) - 1
+    start = max(int(lock_weeks(lock_period)), 1) if lock_delays_returns else 1
+
+    n = max(t - start + 1, 0)
+    saved_before_lock = min(t, start - 1)
+    base = initial_capital + savings_weekly * saved_before_lock
+    growth = np.exp(n * np.log1p(rates))
+    annuity = annuity_factor(rates, n)
+    final_value = base * growth + savings_weekly * annuity
+    deposits = initial_capital + savings_weekly * t
+
+    # Derivatives with respect to the weekly rate and the number of compounding weeks
+    d_annuity = np.divide(
+        n * growth / (1 + rates) * rates - (growth - 1),
+        rates ** 2,
+        out=np.full(rates.shape, n * (n - 1) / 2),
+        where=rates != 0
+    )
+    d_rate = base * n * growth / (1 + rates) + savings_weekly * d_annuity
+    d_weeks = np.divide(
+        np.log1p(rates) * growth * (base * rates + savings_weekly),
+        rates,
+        out=np.full(rates.shape, savings_weekly),
+        where=rates != 0
+    ) if n > 0 else np.full(rates.shape, savings_weekly)
+    d_start = savings_weekly * growth - d_weeks if lock_delays_returns and start <= t else np.zeros(rates.shape)
+
+    d_final_value = np.stack([
+        growth,
+        (saved_before_lock * growth + annuity) / factor,
+        d_rate * (1 + annual_rates) ** (1 / 52 - 1) / 52,
+        d_weeks * factor,
+        d_start * WEEKS_PER_MONTH
+    ], axis=1)
+    d_deposits = np.array([1, t / factor, 0, savings_weekly * factor, 0])
+
+    # net = V - fee * (V - D) while in the money; net return is relative to deposits
+    net_final_value, fee_rate = apply_performance_fees(final_value, deposits, lock_period, fee_schedule)
+    in_the_money = (final_value > deposits)[:, None]
+    d_net = d_final_value - np.where(in_the_money, fee_rate[:, None] * (d_final_value - d_deposits), 0)
+    d_net_return_pct = (d_net * deposits - net_final_value[:, None] * d_deposits) / deposits ** 2 * 100
+
+    return {
+        'final_value': final_value,
+        'deposits': deposits,
+        'net_return_pct': (net_final_value / deposits - 1) * 100,
+        'd_final_value': d_final_value,
+        'd_net_return_pct': d_net_return_pct
+    }
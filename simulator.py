@@ -2,113 +2,131 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import base64
-from io import BytesIO
+import os
+from scenario_engine import (SCENARIO_PRESETS, SENSITIVITY_INPUTS, scenario_results, resample_results, date_axis,
+                             to_weeks, lock_weeks, cumulative_deposits)
+from compute_client import compute, ComputeError
+from goal_seek import SOLVABLE, solve_goal
+from backtest import PRICE_DIR, backtest_available, backtest_summary, data_version
+from charts import build_fan_chart, make_trace, tornado_figure, MAX_POINTS
+from result_cache import RESULT_CACHE, scenario_key
+from exporters import export_to_file, parquet_available, EXPORT_FORMATS
+from perf_metrics import StageTimer, debug_panel
 
-def calculate_performance_fee(return_pct, lock_period):
-    """Calculate performance fee based on return range and lock period"""
-    if return_pct <= 12:
-        return 0.10  # 10%
-    elif return_pct <= 25:
-        return 0.18  # 18%
-    elif return_pct <= 40:
-        return 0.25  # 25%
-    else:
-        return 0.32  # 32%
+# Annual rates and fee tiers behind each scenario, shared with batch_runner.py
+PRESET = 'legacy'
+SCENARIO_RATES = SCENARIO_PRESETS[PRESET]['rates']
 
-def calculate_investment_scenarios(initial_capital, periodic_savings, periods, lock_period, savings_frequency):
-    # Convert periods to weeks for internal calculations
-    if savings_frequency == 'Mensual':
-        weeks = periods * 4
-        savings_weekly = periodic_savings / 4
-    elif savings_frequency == 'Trimestral':
-        weeks = periods * 12
-        savings_weekly = periodic_savings / 12
-    else:  # Weekly
-        weeks = periods
-        savings_weekly = periodic_savings
-    
-    # Generate timestamps
-    dates = [datetime.now() + timedelta(weeks=x) for x in range(weeks)]
-    
-    # Calculate cumulative savings
-    cumulative_savings = [initial_capital + (savings_weekly * i) for i in range(weeks)]
-    
-    # Initialize scenario arrays
-    pessimistic = [initial_capital]
-    moderate = [initial_capital]
-    optimistic = [initial_capital]
-    
-    # Weekly rates
-    pessimistic_weekly = (1 + 0.1857) ** (1/52) - 1
-    moderate_weekly = (1 + 0.2950) ** (1/52) - 1
-    optimistic_weekly = (1 + 0.5900) ** (1/52) - 1
-    
-    # Convert lock period to weeks
-    lock_weeks = lock_period * 4
-    
-    for week in range(1, weeks):
-        if week < lock_weeks:
-            # During lock period, only accumulate savings
-            pessimistic.append(pessimistic[-1] + savings_weekly)
-            moderate.append(moderate[-1] + savings_weekly)
-            optimistic.append(optimistic[-1] + savings_weekly)
-        else:
-            # After lock period, apply returns and fees
-            pess_return = pessimistic[-1] * (1 + pessimistic_weekly)
-            mod_return = moderate[-1] * (1 + moderate_weekly)
-            opt_return = optimistic[-1] * (1 + optimistic_weekly)
-            
-            pessimistic.append(pess_return + savings_weekly)
-            moderate.append(mod_return + savings_weekly)
-            optimistic.append(opt_return + savings_weekly)
-    
-    # Calculate final returns for fee calculation
-    final_returns = {
-        'pessimistic': (pessimistic[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100,
-        'moderate': (moderate[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100,
-        'optimistic': (optimistic[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100
-    }
-    
-    # Calculate fees
-    fees = {
-        'pessimistic': calculate_performance_fee(final_returns['pessimistic'], lock_period),
-        'moderate': calculate_performance_fee(final_returns['moderate'], lock_period),
-        'optimistic': calculate_performance_fee(final_returns['optimistic'], lock_period)
-    }
-    
+# Chart and export resolutions; daily views run the daily engine, the rest aggregate the weekly one
+RESOLUTIONS = {
+    'Diaria': 'D',
+    'Semanal': 'W',
+    'Mensual': 'M',
+    'Trimestral': 'Q'
+}
+
+# Inputs of the tornado chart and the relative step each one moves
+SENSITIVITY_LABELS = {
+    'initial_capital': 'Capital Inicial',
+    'periodic_savings': 'Ahorro Periódico',
+    'annual_rate': 'Tasa Anual',
+    'periods': 'Horizonte',
+    'lock_period': 'Período de Bloqueo'
+}
+TORNADO_STEP = 0.10
+
+SCENARIO_LABELS = {
+    'pessimistic': 'Pesimista',
+    'moderate': 'Moderado',
+    'optimistic': 'Optimista'
+}
+
+def calculate_investment_scenarios(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                                   resolution='W'):
+    # Scenario math and the datetime64 date axis live in scenario_engine
+    return scenario_results(
+        initial_capital,
+        periodic_savings,
+        periods,
+        lock_period,
+        savings_frequency,
+        preset=PRESET,
+        resolution=resolution
+    )
+
+def export_sheets(results):
+    """Columns to export, straight from the result arrays"""
     return {
-        'dates': dates,
-        'savings': cumulative_savings,
-        'pessimistic': pessimistic,
-        'moderate': moderate,
-        'optimistic': optimistic,
-        'fees': fees,
-        'returns': final_returns
+        'Simulación': {
+            'Fecha': results['dates'],
+            'Depósitos Acumulados': results['savings'],
+            'Escenario Pesimista': results['pessimistic'],
+            'Escenario Moderado': results['moderate'],
+            'Escenario Optimista': results['optimistic']
+        }
     }
 
-def export_to_excel(results):
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    
-    # Create DataFrame with results
-    df = pd.DataFrame({
-        'Fecha': results['dates'],
-        'Depósitos Acumulados': results['savings'],
-        'Escenario Pesimista': results['pessimistic'],
-        'Escenario Moderado': results['moderate'],
-        'Escenario Optimista': results['optimistic']
-    })
-    
-    df.to_excel(writer, sheet_name='Simulación', index=False)
-    writer.close()
-    
-    return output.getvalue()
+def build_scenario_figure(results, x_range=None):
+    """Build the scenario chart from calculate_investment_scenarios results"""
+    fig = go.Figure()
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['savings'],
+        x_range=x_range,
+        name="Depósitos acumulados",
+        line=dict(dash='dash', color='blue')
+    ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['pessimistic'],
+        x_range=x_range,
+        name="Escenario Pesimista",
+        line=dict(color='red')
+    ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['moderate'],
+        x_range=x_range,
+        name="Escenario Moderado",
+        line=dict(color='orange')
+    ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['optimistic'],
+        x_range=x_range,
+        name="Escenario Optimista",
+        line=dict(color='green')
+    ))
+    
+    fig.update_layout(
+        title="Simulación de Flujos: Depósitos vs. Inversión",
+        xaxis_title="Fecha",
+        yaxis_title="Valor Acumulado (USD)",
+        hovermode='x unified',
+        height=600
+    )
+    
+    return fig
 
 def main():
     st.set_page_config(page_title="StreakBull Investment Simulator", layout="wide")
     
+    # Per-stage timings, logged on every rerun and optionally shown in the sidebar
+    debug = st.sidebar.checkbox("Panel de Rendimiento", value=False)
+    timer = StageTimer('simulator', trace_memory=debug)
+    try:
+        render(timer)
+    finally:
+        timer.emit()
+    if debug:
+        debug_panel(timer, "Rendimiento")
+
+def render(timer):
+    """Widgets, results and charts of one rerun, timed stage by stage"""
     # Display StreakBull logo
     st.image("https://github.com/aimerdoux/streakbull/blob/main/Logo%20(1).png", width=200)  # Update with actual logo path
     
@@ -144,104 +162,389 @@ def main():
     
     with col2:
         if savings_frequency == 'Semanal':
-            periods = st.slider("Semanas de Simulación", 10, 260, 52)
+            periods = st.slider("Semanas de Simulación", 10, 1560, 52)
         elif savings_frequency == 'Mensual':
-            periods = st.slider("Meses de Simulación", 3, 60, 12)
+            periods = st.slider("Meses de Simulación", 3, 360, 12)
         else:
-            periods = st.slider("Trimestres de Simulación", 1, 20, 4)
+            periods = st.slider("Trimestres de Simulación", 1, 120, 4)
         
         lock_period = st.radio(
             "Período de Bloqueo",
             options=[6, 12],
             format_func=lambda x: f"{x} meses"
         )
+        
+        resolution = RESOLUTIONS[st.selectbox("Resolución", options=list(RESOLUTIONS), index=1)]
     
-    # Calculate scenarios
-    results = calculate_investment_scenarios(
-        initial_capital,
-        periodic_savings,
-        periods,
-        lock_period,
-        savings_frequency
-    )
+    # Calculate scenarios, reusing results across reruns and sessions
+    inputs = scenario_key(initial_capital, periodic_savings, periods, lock_period, savings_frequency)
+    engine_resolution = 'D' if resolution == 'D' else 'W'
+    with timer.stage('scenarios') as stage:
+        full_results = RESULT_CACHE.get_or_compute(
+            ('simulator', 'scenarios', engine_resolution) + inputs,
+            lambda: calculate_investment_scenarios(
+                initial_capital,
+                periodic_savings,
+                periods,
+                lock_period,
+                savings_frequency,
+                engine_resolution
+            )
+        )
+        stage['payload'] = full_results
     
-    # Create plot
-    fig = go.Figure()
+    # Monthly and quarterly views index the cached weekly results, without recomputing
+    with timer.stage('resample') as stage:
+        results = resample_results(full_results, resolution)
+        stage['payload'] = results
     
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['savings'],
-        name="Depósitos acumulados",
-        line=dict(dash='dash', color='blue')
-    ))
+    # Long horizons are drawn downsampled; the visible window is re-rendered at full resolution
+    x_range = None
+    if len(results['dates']) > MAX_POINTS:
+        first, last = results['dates'][0].item(), results['dates'][-1].item()
+        x_range = st.slider(
+            "Ventana Visible",
+            min_value=first,
+            max_value=last,
+            value=(first, last)
+        )
     
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['pessimistic'],
-        name="Escenario Pesimista",
-        line=dict(color='red')
-    ))
+    # Create plot (cached per inputs, resolution and visible window)
+    with timer.stage('figure') as stage:
+        fig = RESULT_CACHE.get_or_compute(
+            ('simulator', 'figure', resolution) + inputs + (x_range,),
+            lambda: build_scenario_figure(results, x_range)
+        )
+        stage['payload'] = fig
     
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['moderate'],
-        name="Escenario Moderado",
-        line=dict(color='orange')
-    ))
+    with timer.stage('render_figure'):
+        st.plotly_chart(fig, use_container_width=True)
     
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['optimistic'],
-        name="Escenario Optimista",
-        line=dict(color='green')
-    ))
+    # Stochastic mode calibrated to StreakBull's daily volatility
+    if st.checkbox("Modo Estocástico (Monte Carlo)", value=False):
+        mc_col1, mc_col2 = st.columns(2)
+        with mc_col1:
+            mc_scenario = st.selectbox(
+                "Escenario Estocástico",
+                options=list(SCENARIO_RATES),
+                index=1,
+                format_func=lambda x: SCENARIO_LABELS[x]
+            )
+        with mc_col2:
+            n_paths = st.select_slider(
+                "Número de Trayectorias",
+                options=[10_000, 50_000, 100_000, 500_000, 1_000_000],
+                value=10_000
+            )
+            seed = st.number_input("Semilla", min_value=0, value=2024, step=1)
+        
+        weeks, savings_weekly = to_weeks(periods, periodic_savings, savings_frequency)
+        with timer.stage('monte_carlo') as stage:
+            monte_carlo = RESULT_CACHE.get_or_compute(
+                ('simulator', 'monte_carlo', mc_scenario, n_paths, seed) + inputs,
+                lambda: compute(
+                    'monte_carlo',
+                    initial_capital=initial_capital,
+                    savings_weekly=savings_weekly,
+                    weeks=weeks,
+                    annual_rate=SCENARIO_RATES[mc_scenario],
+                    n_paths=n_paths,
+                    lock_weeks=int(lock_weeks(lock_period)),
+                    seed=seed
+                )
+            )
+            stage['payload'] = monte_carlo
+        
+        # Monte Carlo paths are weekly whatever the chart resolution
+        with timer.stage('fan_chart') as stage:
+            fan_chart = build_fan_chart(
+                date_axis(full_results['dates'][0], weeks, 'W'),
+                monte_carlo,
+                deposits=cumulative_deposits(initial_capital, savings_weekly, weeks),
+                name=SCENARIO_LABELS[mc_scenario],
+                x_range=x_range
+            )
+            stage['payload'] = fan_chart
+        with timer.stage('render_fan_chart'):
+            st.plotly_chart(fan_chart, use_container_width=True)
+        
+        st.markdown(
+            f"Probabilidad de terminar por debajo de los depósitos: "
+            f"**{monte_carlo['prob_below_deposits'] * 100:.2f}%** · "
+            f"Valor final mediano: **${monte_carlo['percentiles'][50][-1]:,.2f}**"
+        )
     
-    fig.update_layout(
-        title="Simulación de Flujos: Depósitos vs. Inversión",
-        xaxis_title="Fecha",
-        yaxis_title="Valor Acumulado (USD)",
-        hovermode='x unified',
-        height=600
-    )
+    # Real price history: outcomes for every past entry date over the same horizon
+    if st.checkbox("Modo Histórico (Backtest)", value=False):
+        if not backtest_available():
+            st.info(
+                f"Copie qqq.csv y streakbull.csv (columnas date y close o return) en {PRICE_DIR} "
+                f"para activar el backtest histórico."
+            )
+        else:
+            try:
+                with timer.stage('backtest') as stage:
+                    backtest = RESULT_CACHE.get_or_compute(
+                        ('simulator', 'backtest') + inputs + data_version(),
+                        lambda: compute(
+                            'backtest',
+                            initial_capital=initial_capital,
+                            periodic_savings=periodic_savings,
+                            periods=periods,
+                            savings_frequency=savings_frequency,
+                            lock_period=lock_period,
+                            fee_schedule=SCENARIO_PRESETS[PRESET]['fee_schedule']
+                        )
+                    )
+                    stage['payload'] = backtest
+            except (ValueError, ComputeError) as e:
+                st.warning(f"Backtest no disponible: {e}")
+                backtest = None
+        
+            if backtest is not None:
+                bt_scenario = st.selectbox(
+                    "Escenario Histórico",
+                    options=list(SCENARIO_RATES),
+                    index=1,
+                    format_func=lambda x: SCENARIO_LABELS[x]
+                )
+                with timer.stage('backtest_chart') as stage:
+                    bt_chart = build_fan_chart(
+                        backtest['offsets'],
+                        backtest[bt_scenario],
+                        deposits=backtest['deposits'],
+                        name=SCENARIO_LABELS[bt_scenario]
+                    )
+                    bt_chart.update_layout(
+                        title=f"Backtest Histórico ({backtest['n_windows']:,} fechas de entrada, "
+                              f"{backtest['start_dates'][0]} a {backtest['start_dates'][-1]})",
+                        xaxis_title="Días hábiles desde la entrada"
+                    )
+                    stage['payload'] = bt_chart
+                with timer.stage('render_backtest_chart'):
+                    st.plotly_chart(bt_chart, use_container_width=True)
+                
+                summary = backtest_summary(backtest, names=tuple(SCENARIO_RATES))
+                backtest_table = pd.DataFrame({
+                    'Escenario': [SCENARIO_LABELS[name] for name in summary['scenario']],
+                    'Valor Final p5': summary['final_value_p5'],
+                    'Valor Final Mediano': summary['final_value_p50'],
+                    'Valor Final p95': summary['final_value_p95'],
+                    'Retorno Mediano (%)': summary['return_pct_p50'],
+                    'Máximo Drawdown Mediano': summary['max_drawdown_p50'],
+                    'Máximo Drawdown p95': summary['max_drawdown_p95'],
+                    'Bajo Depósitos': summary['prob_below_deposits']
+                })
+                for column in ('Valor Final p5', 'Valor Final Mediano', 'Valor Final p95'):
+                    backtest_table[column] = backtest_table[column].map('${:,.2f}'.format)
+                backtest_table['Retorno Mediano (%)'] = backtest_table['Retorno Mediano (%)'].map('{:.2f}%'.format)
+                for column in ('Máximo Drawdown Mediano', 'Máximo Drawdown p95'):
+                    backtest_table[column] = backtest_table[column].map('-{:.2f}%'.format)
+                backtest_table['Bajo Depósitos'] = backtest_table['Bajo Depósitos'].map('{:.1%}'.format)
+                st.table(backtest_table)
     
-    st.plotly_chart(fig, use_container_width=True)
+    # Per-deposit lots: every contribution has its own lock expiry, fee crystallization and high-water mark
+    if st.checkbox("Modo Lotes (Ledger por Depósito)", value=False):
+        with timer.stage('lot_ledger') as stage:
+            ledger = RESULT_CACHE.get_or_compute(
+                ('simulator', 'lots') + inputs,
+                lambda: compute(
+                    'lots',
+                    initial_capital=initial_capital,
+                    periodic_savings=periodic_savings,
+                    periods=periods,
+                    lock_period=lock_period,
+                    savings_frequency=savings_frequency,
+                    preset=PRESET
+                )
+            )
+            stage['payload'] = ledger
+        lot_scenario = st.selectbox(
+            "Escenario de Lotes",
+            options=list(SCENARIO_RATES),
+            index=1,
+            format_func=lambda x: SCENARIO_LABELS[x]
+        )
+        i = list(SCENARIO_RATES).index(lot_scenario)
+        start_date = full_results['dates'][0]
+        lot_dates = date_axis(start_date, ledger['deposits'].size, 'W')
+        
+        with timer.stage('lot_chart') as stage:
+            lot_chart = go.Figure()
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['liquid'][i],
+                x_range=x_range,
+                name="Saldo Líquido",
+                fill='tozeroy',
+                line=dict(color='green')
+            ))
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['liquid'][i] + ledger['locked'][i],
+                x_range=x_range,
+                name="Líquido + Bloqueado",
+                fill='tonexty',
+                line=dict(color='gray')
+            ))
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['deposits'],
+                x_range=x_range,
+                name="Depósitos acumulados",
+                line=dict(dash='dash', color='blue')
+            ))
+            lot_chart.update_layout(
+                title=f"Saldo Líquido vs. Bloqueado por Lotes ({SCENARIO_LABELS[lot_scenario]})",
+                xaxis_title="Fecha",
+                yaxis_title="Valor (USD)",
+                hovermode='x unified'
+            )
+            stage['payload'] = lot_chart
+        with timer.stage('render_lot_chart'):
+            st.plotly_chart(lot_chart, use_container_width=True)
+        
+        lot_summary = pd.DataFrame({
+            'Escenario': [SCENARIO_LABELS[name] for name in SCENARIO_RATES],
+            'Saldo Líquido': ledger['liquid'][:, -1],
+            'Saldo Bloqueado': ledger['locked'][:, -1],
+            'Comisiones Pagadas': ledger['fees_paid'][:, -1],
+            'Comisión Devengada': ledger['accrued_fee'].sum(axis=1),
+            'Valor Neto': ledger['net_value'].sum(axis=1)
+        })
+        for column in lot_summary.columns[1:]:
+            lot_summary[column] = lot_summary[column].map('${:,.2f}'.format)
+        st.table(lot_summary)
+        
+        lots = ledger['lots']
+        st.dataframe(pd.DataFrame({
+            'Entrada': start_date + 7 * lots['entry'].astype('timedelta64[D]'),
+            'Vencimiento': start_date + 7 * lots['expiry'].astype('timedelta64[D]'),
+            'Monto': lots['amount'],
+            'Marca de Agua': ledger['high_water'][i],
+            'Valor': ledger['value'][i],
+            'Comisión Pagada': ledger['fee_paid'][i],
+            'Comisión Devengada': ledger['accrued_fee'][i],
+            'Estado': np.where(ledger['is_locked'], 'Bloqueado', 'Líquido')
+        }), use_container_width=True, hide_index=True)
     
     # Display summary statistics and fees
     st.subheader("Resumen de Inversión")
     
-    final_values = pd.DataFrame({
-        'Escenario': ['Depósitos', 'Pesimista', 'Moderado', 'Optimista'],
-        'Valor Final': [
-            results['savings'][-1],
-            results['pessimistic'][-1],
-            results['moderate'][-1],
-            results['optimistic'][-1]
-        ],
-        'Retorno (%)': [
-            0,
-            results['returns']['pessimistic'],
-            results['returns']['moderate'],
-            results['returns']['optimistic']
-        ],
-        'Comisión de Performance': [
-            '0%',
-            f"{results['fees']['pessimistic']*100}%",
-            f"{results['fees']['moderate']*100}%",
-            f"{results['fees']['optimistic']*100}%"
-        ]
-    })
-    
-    final_values['Valor Final'] = final_values['Valor Final'].map('${:,.2f}'.format)
-    final_values['Retorno (%)'] = final_values['Retorno (%)'].map('{:.2f}%'.format)
-    
-    st.table(final_values)
+    with timer.stage('summary_dataframe') as stage:
+        final_values = pd.DataFrame({
+            'Escenario': ['Depósitos', 'Pesimista', 'Moderado', 'Optimista'],
+            'Valor Final': results.values[:, -1],
+            'Retorno (%)': np.concatenate([[0], results.returns]),
+            'Comisión de Performance': ['0%'] + [f"{fee * 100}%" for fee in results.fees.tolist()]
+        })
+        
+        final_values['Valor Final'] = final_values['Valor Final'].map('${:,.2f}'.format)
+        final_values['Retorno (%)'] = final_values['Retorno (%)'].map('{:.2f}%'.format)
+        stage['payload'] = final_values
+    
+    with timer.stage('render_table'):
+        st.table(final_values)
+    
+    # Tornado chart from the closed-form partial derivatives computed with the scenarios
+    with st.expander("Análisis de Sensibilidad"):
+        sens_scenario = st.selectbox(
+            "Escenario de Sensibilidad",
+            options=list(SCENARIO_RATES),
+            index=1,
+            format_func=lambda x: SCENARIO_LABELS[x]
+        )
+        i = list(SCENARIO_RATES).index(sens_scenario)
+        sensitivities = results['sensitivities']
+        input_values = np.array([
+            initial_capital,
+            periodic_savings,
+            SCENARIO_RATES[sens_scenario],
+            periods,
+            lock_period
+        ], dtype=float)
+        with timer.stage('tornado') as stage:
+            tornado = tornado_figure(
+                [SENSITIVITY_LABELS[name] for name in SENSITIVITY_INPUTS],
+                sensitivities['d_final_value'][i] * input_values * TORNADO_STEP,
+                title=f"Sensibilidad del Valor Final ({SCENARIO_LABELS[sens_scenario]}, ±{TORNADO_STEP:.0%})",
+                step_label=f"{TORNADO_STEP:.0%}"
+            )
+            stage['payload'] = tornado
+        st.plotly_chart(tornado, use_container_width=True)
+        st.table(pd.DataFrame({
+            'Variable': [SENSITIVITY_LABELS[name] for name in SENSITIVITY_INPUTS],
+            'Δ Valor Final por Unidad': [f"{x:,.4f}" for x in sensitivities['d_final_value'][i]],
+            'Δ Retorno Neto (pp) por Unidad': [f"{x:,.6f}" for x in sensitivities['d_net_return_pct'][i]]
+        }))
+    
+    # Goal seek: the input each scenario needs to reach a target value net of fees, the others fixed
+    with st.expander("Meta de Inversión"):
+        target_value = st.number_input("Valor Objetivo Neto (USD)", min_value=0.0, value=100000.0, step=1000.0)
+        solve_for = st.selectbox(
+            "Calcular",
+            options=SOLVABLE,
+            format_func=lambda x: SENSITIVITY_LABELS[x]
+        )
+        with timer.stage('goal_seek') as stage:
+            goal = RESULT_CACHE.get_or_compute(
+                ('simulator', 'goal_seek', target_value, solve_for) + inputs,
+                lambda: solve_goal(
+                    target_value,
+                    solve_for,
+                    initial_capital=initial_capital,
+                    periodic_savings=periodic_savings,
+                    periods=periods,
+                    lock_period=lock_period,
+                    savings_frequency=savings_frequency,
+                    annual_rate=np.array(list(SCENARIO_RATES.values())),
+                    lock_delays_returns=SCENARIO_PRESETS[PRESET]['lock_delays_returns'],
+                    fee_schedule=SCENARIO_PRESETS[PRESET]['fee_schedule']
+                )
+            )
+            stage['payload'] = goal
+        value_format = {
+            'periodic_savings': '${:,.2f}'.format,
+            'initial_capital': '${:,.2f}'.format,
+            'periods': lambda x: f"{x:.0f} ({savings_frequency})",
+            'annual_rate': '{:.2%}'.format
+        }[solve_for]
+        # The required rate is the same for every scenario; the other inputs depend on its rate
+        rows = slice(0, 1) if solve_for == 'annual_rate' else slice(None)
+        scenario_names = ['Todos'] if solve_for == 'annual_rate' else [SCENARIO_LABELS[name] for name in SCENARIO_RATES]
+        st.table(pd.DataFrame({
+            'Escenario': scenario_names,
+            SENSITIVITY_LABELS[solve_for]: [
+                value_format(x) if np.isfinite(x) else 'Inalcanzable' for x in goal['value'][rows]
+            ],
+            'Depósitos': [f"${x:,.2f}" if np.isfinite(x) else '-' for x in goal['deposits'][rows]],
+            'Valor Final Neto': [f"${x:,.2f}" if np.isfinite(x) else '-' for x in goal['net_final_value'][rows]]
+        }))
     
     # Export results button
+    export_formats = ['Excel', 'CSV'] + (['Parquet'] if parquet_available() else [])
+    file_format = st.selectbox("Formato de Exportación", options=export_formats)
     if st.button('Exportar Resultados'):
-        excel_data = export_to_excel(results)
-        b64 = base64.b64encode(excel_data).decode()
-        href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="simulacion_streakbull.xlsx">Descargar Excel</a>'
-        st.markdown(href, unsafe_allow_html=True)
+        # Written to a temporary file chunk by chunk; st.download_button has no streaming
+        # API, so the finished file is still read into memory once to be served
+        with timer.stage('export') as stage:
+            path = export_to_file(export_sheets(results), file_format)
+            stage['payload_bytes'] = os.path.getsize(path)
+        extension, mime = EXPORT_FORMATS[file_format]
+        try:
+            with open(path, 'rb') as f:
+                st.download_button(
+                    f"Descargar {file_format}",
+                    data=f,
+                    file_name=f"simulacion_streakbull.{extension}",
+                    mime=mime
+                )
+        finally:
+            os.remove(path)
+    
+    # Process-wide cache counters
+    with st.expander("Estadísticas de Caché"):
+        st.json(RESULT_CACHE.stats())
 
 if __name__ == "__main__":
     main()
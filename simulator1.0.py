@@ -2,128 +2,183 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import base64
-from io import BytesIO
+import os
+from scenario_engine import (SCENARIO_PRESETS, SENSITIVITY_INPUTS, PERIODS_PER_YEAR, scenario_results, resample_results,
+                             date_axis, to_weeks, cumulative_deposits, evaluate_grid)
+from monte_carlo import HISTORICAL_MAX_DRAWDOWN
+from compute_client import compute, ComputeError
+from goal_seek import SOLVABLE, solve_goal
+from backtest import PRICE_DIR, backtest_available, backtest_summary, data_version
+from stress_test import stress_results
+from drawdown import drawdown_analytics
+from charts import build_fan_chart, make_trace, tornado_figure, MAX_POINTS
+from result_cache import RESULT_CACHE, scenario_key
+from exporters import export_to_file, parquet_available, EXPORT_FORMATS
+from perf_metrics import StageTimer, debug_panel
 
-def export_to_excel(results):
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    
-    df = pd.DataFrame({
-        'Fecha': results['dates'],
-        'Depósitos Acumulados': results['savings'],
-        'Escenario Pesimista': results['pessimistic'],
-        'Escenario Moderado': results['moderate'],
-        'Escenario Optimista': results['optimistic'],
-        'Drawdown Pesimista (%)': results['drawdown_pess'],
-        'Drawdown Moderado (%)': results['drawdown_mod'],
-        'Drawdown Optimista (%)': results['drawdown_opt']
-    })
-    
-    df.to_excel(writer, sheet_name='Simulación', index=False)
-    writer.close()
-    
-    return output.getvalue()
+# Annual rates and fee tiers behind each scenario, shared with batch_runner.py
+PRESET = 'streakbull'
+SCENARIO_RATES = SCENARIO_PRESETS[PRESET]['rates']
 
-def calculate_performance_fee(return_pct, lock_period):
-    """Calculate performance fee based on return range and lock period"""
-    if lock_period == 6:
-        if return_pct <= 15:
-            return 0.18  # 18%
-        elif return_pct <= 35:
-            return 0.24  # 24%
-        elif return_pct <= 60:
-            return 0.33  # 33%
-        else:
-            return 0.39  # 39%
-    else:  # 12 month lock period
-        if return_pct <= 15:
-            return 0.15  # 15%
-        elif return_pct <= 35:
-            return 0.19  # 19%
-        elif return_pct <= 60:
-            return 0.27  # 27%
-        else:
-            return 0.33  # 33%
+# Chart and export resolutions; daily views run the daily engine, the rest aggregate the weekly one
+RESOLUTIONS = {
+    'Diaria': 'D',
+    'Semanal': 'W',
+    'Mensual': 'M',
+    'Trimestral': 'Q'
+}
 
-def calculate_drawdown(values):
-    """Calculate the maximum drawdown for a series of values"""
-    peak = values[0]
-    drawdowns = []
-    for value in values:
-        if value > peak:
-            peak = value
-        drawdown = (peak - value) / peak * 100
-        drawdowns.append(drawdown)
-    return drawdowns
+# Inputs of the tornado chart and the relative step each one moves
+SENSITIVITY_LABELS = {
+    'initial_capital': 'Capital Inicial',
+    'periodic_savings': 'Ahorro Periódico',
+    'annual_rate': 'Tasa Anual',
+    'periods': 'Horizonte',
+    'lock_period': 'Período de Bloqueo'
+}
+TORNADO_STEP = 0.10
 
-def calculate_investment_scenarios(initial_capital, periodic_savings, periods, lock_period, savings_frequency, include_savings):
-    # Convert periods to weeks for internal calculations
-    if savings_frequency == 'Mensual':
-        weeks = periods * 4
-        savings_weekly = periodic_savings / 4 if include_savings else 0
-    elif savings_frequency == 'Trimestral':
-        weeks = periods * 12
-        savings_weekly = periodic_savings / 12 if include_savings else 0
-    else:  # Weekly
-        weeks = periods
-        savings_weekly = periodic_savings if include_savings else 0
-    
-    dates = [datetime.now() + timedelta(weeks=x) for x in range(weeks)]
-    cumulative_savings = [initial_capital + (savings_weekly * i) for i in range(weeks)]
-    
-    # Initialize scenario arrays
-    pessimistic = [initial_capital]
-    moderate = [initial_capital]
-    optimistic = [initial_capital]
-    
-    # Weekly rates (based on historical performance)
-    pessimistic_weekly = (1 + 0.1857) ** (1/52) - 1  # QQQ baseline
-    moderate_weekly = (1 + 0.2950) ** (1/52) - 1     # StreakBull baseline
-    optimistic_weekly = (1 + 0.6500) ** (1/52) - 1   # Enhanced StreakBull (updated to 65%)
-    
-    # Calculate returns
-    for week in range(1, weeks):
-        pess_return = pessimistic[-1] * (1 + pessimistic_weekly)
-        mod_return = moderate[-1] * (1 + moderate_weekly)
-        opt_return = optimistic[-1] * (1 + optimistic_weekly)
-        
-        pessimistic.append(pess_return + savings_weekly)
-        moderate.append(mod_return + savings_weekly)
-        optimistic.append(opt_return + savings_weekly)
-    
-    # Calculate drawdowns
-    drawdown_pess = calculate_drawdown(pessimistic)
-    drawdown_mod = calculate_drawdown(moderate)
-    drawdown_opt = calculate_drawdown(optimistic)
-    
-    # Calculate final returns
-    final_returns = {
-        'pessimistic': (pessimistic[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100,
-        'moderate': (moderate[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100,
-        'optimistic': (optimistic[-1] - cumulative_savings[-1]) / cumulative_savings[-1] * 100
+SCENARIO_LABELS = {
+    'pessimistic': 'Pesimista',
+    'moderate': 'Moderado',
+    'optimistic': 'Optimista'
+}
+
+def export_sheets(results):
+    """Columns to export, straight from the result arrays"""
+    drawdowns = results.drawdowns
+    return {
+        'Simulación': {
+            'Fecha': results['dates'],
+            'Depósitos Acumulados': results['savings'],
+            'Escenario Pesimista': results['pessimistic'],
+            'Escenario Moderado': results['moderate'],
+            'Escenario Optimista': results['optimistic'],
+            'Drawdown Pesimista (%)': drawdowns['underwater'][0],
+            'Drawdown Moderado (%)': drawdowns['underwater'][1],
+            'Drawdown Optimista (%)': drawdowns['underwater'][2]
+        },
+        'Drawdown': {
+            'Escenario': [SCENARIO_LABELS[name] for name in results.names],
+            'Máximo Drawdown (%)': drawdowns['max_drawdown'],
+            'Duración (semanas)': drawdowns['max_duration'],
+            'Recuperación (semanas)': drawdowns['time_to_recovery'],
+            'Ratio Calmar': drawdowns['calmar']
+        }
     }
+
+def calculate_investment_scenarios(initial_capital, periodic_savings, periods, lock_period, savings_frequency, include_savings,
+                                   resolution='W'):
+    # Scenario math lives in scenario_engine; drawdowns are added here
+    results = scenario_results(
+        initial_capital,
+        periodic_savings,
+        periods,
+        lock_period,
+        savings_frequency,
+        preset=PRESET,
+        include_savings=include_savings,
+        resolution=resolution
+    )
     
-    # Calculate fees
-    fees = {
-        'pessimistic': calculate_performance_fee(final_returns['pessimistic'], lock_period),
-        'moderate': calculate_performance_fee(final_returns['moderate'], lock_period),
-        'optimistic': calculate_performance_fee(final_returns['optimistic'], lock_period)
-    }
+    # Calculate drawdowns for every scenario in one pass over the path block, at the engine's resolution
+    periods_per_year = PERIODS_PER_YEAR[results.resolution]
+    weeks_per_step = 52 / periods_per_year
+    drawdowns = drawdown_analytics(results.paths, periods_per_year)
+    drawdowns['max_duration'] = drawdowns['max_duration'] * weeks_per_step
+    drawdowns['time_to_recovery'] = drawdowns['time_to_recovery'] * weeks_per_step
+    results.drawdowns = drawdowns
+    return results
+
+def build_scenario_figure(results, include_savings, show_drawdown, x_range=None):
+    """Build the scenario chart from calculate_investment_scenarios results"""
+    fig = go.Figure()
     
-    return {
-        'dates': dates,
-        'savings': cumulative_savings,
-        'pessimistic': pessimistic,
-        'moderate': moderate,
-        'optimistic': optimistic,
-        'drawdown_pess': drawdown_pess,
-        'drawdown_mod': drawdown_mod,
-        'drawdown_opt': drawdown_opt,
-        'fees': fees,
-        'returns': final_returns
-    }
+    if include_savings:
+        fig.add_trace(make_trace(
+            results['dates'],
+            results['savings'],
+            x_range=x_range,
+            name="Depósitos acumulados",
+            line=dict(dash='dash', color='blue')
+        ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['pessimistic'],
+        x_range=x_range,
+        name="Escenario Pesimista",
+        line=dict(color='red')
+    ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['moderate'],
+        x_range=x_range,
+        name="Escenario Moderado",
+        line=dict(color='orange')
+    ))
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        results['optimistic'],
+        x_range=x_range,
+        name="Escenario Optimista",
+        line=dict(color='green')
+    ))
+    
+    # Add historical max drawdown line
+    drawdown_line = np.full(len(results['dates']), HISTORICAL_MAX_DRAWDOWN)  # Historical max drawdown
+    
+    fig.add_trace(make_trace(
+        results['dates'],
+        drawdown_line,
+        x_range=x_range,
+        name=f"Máximo Drawdown Histórico ({HISTORICAL_MAX_DRAWDOWN}%)",
+        line=dict(color='red', dash='dash'),
+        visible=show_drawdown
+    ))
+    
+    if show_drawdown:
+        underwater = -results.drawdowns['underwater']
+        fig.add_trace(make_trace(
+            results['dates'],
+            underwater[0],
+            x_range=x_range,
+            name="Drawdown Pesimista",
+            line=dict(color='red', dash='dot')
+        ))
+        
+        fig.add_trace(make_trace(
+            results['dates'],
+            underwater[1],
+            x_range=x_range,
+            name="Drawdown Moderado",
+            line=dict(color='orange', dash='dot')
+        ))
+        
+        fig.add_trace(make_trace(
+            results['dates'],
+            underwater[2],
+            x_range=x_range,
+            name="Drawdown Optimista",
+            line=dict(color='green', dash='dot')
+        ))
+    
+    fig.update_layout(
+        title="Simulación de Flujos: Depósitos vs. Inversión",
+        xaxis_title="Fecha",
+        yaxis_title="Valor Acumulado (USD)",
+        hovermode='x unified',
+        height=600,
+        paper_bgcolor='#0E1117',
+        plot_bgcolor='#0E1117',
+        font=dict(color='white'),
+        xaxis=dict(gridcolor='#333333'),
+        yaxis=dict(gridcolor='#333333')
+    )
+    
+    return fig
 
 def main():
     st.set_page_config(
@@ -131,7 +186,19 @@ def main():
         layout="wide",
         initial_sidebar_state="collapsed"
     )
+    
+    # Per-stage timings, logged on every rerun and optionally shown in the sidebar
+    debug = st.sidebar.checkbox("Panel de Rendimiento", value=False)
+    timer = StageTimer('simulator1.0', trace_memory=debug)
+    try:
+        render(timer)
+    finally:
+        timer.emit()
+    if debug:
+        debug_panel(timer, "Rendimiento")
 
+def render(timer):
+    """Widgets, results and charts of one rerun, timed stage by stage"""
     st.markdown("""
         <style>
         .stApp {
@@ -214,154 +281,497 @@ def main():
     
     with col2:
         if savings_frequency == 'Semanal':
-            periods = st.slider("Semanas de Simulación", 10, 260, 52)
+            periods = st.slider("Semanas de Simulación", 10, 1560, 52)
         elif savings_frequency == 'Mensual':
-            periods = st.slider("Meses de Simulación", 3, 60, 12)
+            periods = st.slider("Meses de Simulación", 3, 360, 12)
         else:
-            periods = st.slider("Trimestres de Simulación", 1, 20, 4)
+            periods = st.slider("Trimestres de Simulación", 1, 120, 4)
         
         lock_period = st.radio(
             "Período de Bloqueo",
             options=[6, 12],
             format_func=lambda x: f"{x} meses"
         )
+        
+        resolution = RESOLUTIONS[st.selectbox("Resolución", options=list(RESOLUTIONS), index=1)]
     
     show_drawdown = st.checkbox("Mostrar Drawdown", value=False)
+    stochastic_mode = st.checkbox("Modo Estocástico (Monte Carlo)", value=False)
+    
+    # Reuse results across reruns and sessions; display toggles don't recompute
+    inputs = scenario_key(initial_capital, periodic_savings, periods, lock_period, savings_frequency, include_savings)
+    engine_resolution = 'D' if resolution == 'D' else 'W'
+    with timer.stage('scenarios') as stage:
+        full_results = RESULT_CACHE.get_or_compute(
+            ('simulator1.0', 'scenarios', engine_resolution) + inputs,
+            lambda: calculate_investment_scenarios(
+                initial_capital,
+                periodic_savings,
+                periods,
+                lock_period,
+                savings_frequency,
+                include_savings,
+                engine_resolution
+            )
+        )
+        stage['payload'] = full_results
+    
+    # Monthly and quarterly views index the cached weekly results, without recomputing
+    with timer.stage('resample') as stage:
+        results = resample_results(full_results, resolution)
+        stage['payload'] = results
+    
+    # Long horizons are drawn downsampled; the visible window is re-rendered at full resolution
+    x_range = None
+    if len(results['dates']) > MAX_POINTS:
+        first, last = results['dates'][0].item(), results['dates'][-1].item()
+        x_range = st.slider(
+            "Ventana Visible",
+            min_value=first,
+            max_value=last,
+            value=(first, last)
+        )
     
-    results = calculate_investment_scenarios(
-        initial_capital,
-        periodic_savings,
-        periods,
-        lock_period,
-        savings_frequency,
-        include_savings
-    )
-    
-    fig = go.Figure()
-    
-    if include_savings:
-        fig.add_trace(go.Scatter(
-            x=results['dates'],
-            y=results['savings'],
-            name="Depósitos acumulados",
-            line=dict(dash='dash', color='blue')
-        ))
-    
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['pessimistic'],
-        name="Escenario Pesimista",
-        line=dict(color='red')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['moderate'],
-        name="Escenario Moderado",
-        line=dict(color='orange')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=results['optimistic'],
-        name="Escenario Optimista",
-        line=dict(color='green')
-    ))
-    
-    # Add historical max drawdown line
-    max_value = max(max(results['pessimistic']), max(results['moderate']), max(results['optimistic']))
-    drawdown_line = [-15.1] * len(results['dates'])  # Historical max drawdown
-    
-    fig.add_trace(go.Scatter(
-        x=results['dates'],
-        y=drawdown_line,
-        name="Máximo Drawdown Histórico (-15.1%)",
-        line=dict(color='red', dash='dash'),
-        visible=show_drawdown
-    ))
+    # Figure cached per inputs and display options
+    with timer.stage('figure') as stage:
+        fig = RESULT_CACHE.get_or_compute(
+            ('simulator1.0', 'figure', resolution) + inputs + (show_drawdown, x_range),
+            lambda: build_scenario_figure(results, include_savings, show_drawdown, x_range)
+        )
+        stage['payload'] = fig
+    
+    with timer.stage('render_figure'):
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if stochastic_mode:
+        mc_col1, mc_col2 = st.columns(2)
+        with mc_col1:
+            mc_scenario = st.selectbox(
+                "Escenario Estocástico",
+                options=list(SCENARIO_RATES),
+                index=1,
+                format_func=lambda x: SCENARIO_LABELS[x]
+            )
+        with mc_col2:
+            n_paths = st.select_slider(
+                "Número de Trayectorias",
+                options=[10_000, 50_000, 100_000, 500_000, 1_000_000],
+                value=10_000
+            )
+            seed = st.number_input("Semilla", min_value=0, value=2024, step=1)
+        
+        weeks, savings_weekly = to_weeks(periods, periodic_savings if include_savings else 0, savings_frequency)
+        with timer.stage('monte_carlo') as stage:
+            monte_carlo = RESULT_CACHE.get_or_compute(
+                ('simulator1.0', 'monte_carlo', mc_scenario, n_paths, seed) + inputs,
+                lambda: compute(
+                    'monte_carlo',
+                    initial_capital=initial_capital,
+                    savings_weekly=savings_weekly,
+                    weeks=weeks,
+                    annual_rate=SCENARIO_RATES[mc_scenario],
+                    n_paths=n_paths,
+                    seed=seed
+                )
+            )
+            stage['payload'] = monte_carlo
+        
+        # Monte Carlo paths are weekly whatever the chart resolution
+        with timer.stage('fan_chart') as stage:
+            fan_chart = build_fan_chart(
+                date_axis(full_results['dates'][0], weeks, 'W'),
+                monte_carlo,
+                deposits=cumulative_deposits(initial_capital, savings_weekly, weeks) if include_savings else None,
+                name=SCENARIO_LABELS[mc_scenario],
+                x_range=x_range
+            )
+            fan_chart.update_layout(
+                paper_bgcolor='#0E1117',
+                plot_bgcolor='#0E1117',
+                font=dict(color='white'),
+                xaxis=dict(gridcolor='#333333'),
+                yaxis=dict(gridcolor='#333333')
+            )
+            stage['payload'] = fan_chart
+        with timer.stage('render_fan_chart'):
+            st.plotly_chart(fan_chart, use_container_width=True)
+        
+        st.markdown(
+            f"Probabilidad de terminar por debajo de los depósitos: "
+            f"**{monte_carlo['prob_below_deposits'] * 100:.2f}%** · "
+            f"Valor final mediano: **${monte_carlo['percentiles'][50][-1]:,.2f}** · "
+            f"Probabilidad de superar el drawdown histórico ({HISTORICAL_MAX_DRAWDOWN}%): "
+            f"**{monte_carlo['prob_exceeds_drawdown'] * 100:.2f}%**"
+        )
     
-    if show_drawdown:
-        fig.add_trace(go.Scatter(
-            x=results['dates'],
-            y=[-x for x in results['drawdown_pess']],
-            name="Drawdown Pesimista",
-            line=dict(color='red', dash='dot')
-        ))
+    # Real price history: outcomes for every past entry date over the same horizon
+    if st.checkbox("Modo Histórico (Backtest)", value=False):
+        if not backtest_available():
+            st.info(
+                f"Copie qqq.csv y streakbull.csv (columnas date y close o return) en {PRICE_DIR} "
+                f"para activar el backtest histórico."
+            )
+        else:
+            try:
+                with timer.stage('backtest') as stage:
+                    backtest = RESULT_CACHE.get_or_compute(
+                        ('simulator1.0', 'backtest') + inputs + data_version(),
+                        lambda: compute(
+                            'backtest',
+                            initial_capital=initial_capital,
+                            periodic_savings=periodic_savings if include_savings else 0,
+                            periods=periods,
+                            savings_frequency=savings_frequency,
+                            lock_period=lock_period,
+                            fee_schedule=SCENARIO_PRESETS[PRESET]['fee_schedule']
+                        )
+                    )
+                    stage['payload'] = backtest
+            except (ValueError, ComputeError) as e:
+                st.warning(f"Backtest no disponible: {e}")
+                backtest = None
         
-        fig.add_trace(go.Scatter(
-            x=results['dates'],
-            y=[-x for x in results['drawdown_mod']],
-            name="Drawdown Moderado",
-            line=dict(color='orange', dash='dot')
-        ))
+            if backtest is not None:
+                bt_scenario = st.selectbox(
+                    "Escenario Histórico",
+                    options=list(SCENARIO_RATES),
+                    index=1,
+                    format_func=lambda x: SCENARIO_LABELS[x]
+                )
+                with timer.stage('backtest_chart') as stage:
+                    bt_chart = build_fan_chart(
+                        backtest['offsets'],
+                        backtest[bt_scenario],
+                        deposits=backtest['deposits'],
+                        name=SCENARIO_LABELS[bt_scenario]
+                    )
+                    bt_chart.update_layout(
+                        title=f"Backtest Histórico ({backtest['n_windows']:,} fechas de entrada, "
+                              f"{backtest['start_dates'][0]} a {backtest['start_dates'][-1]})",
+                        xaxis_title="Días hábiles desde la entrada"
+                    )
+                    bt_chart.update_layout(
+                        paper_bgcolor='#0E1117',
+                        plot_bgcolor='#0E1117',
+                        font=dict(color='white'),
+                        xaxis=dict(gridcolor='#333333'),
+                        yaxis=dict(gridcolor='#333333')
+                    )
+                    stage['payload'] = bt_chart
+                with timer.stage('render_backtest_chart'):
+                    st.plotly_chart(bt_chart, use_container_width=True)
+                
+                summary = backtest_summary(backtest, names=tuple(SCENARIO_RATES))
+                backtest_table = pd.DataFrame({
+                    'Escenario': [SCENARIO_LABELS[name] for name in summary['scenario']],
+                    'Valor Final p5': summary['final_value_p5'],
+                    'Valor Final Mediano': summary['final_value_p50'],
+                    'Valor Final p95': summary['final_value_p95'],
+                    'Retorno Mediano (%)': summary['return_pct_p50'],
+                    'Máximo Drawdown Mediano': summary['max_drawdown_p50'],
+                    'Máximo Drawdown p95': summary['max_drawdown_p95'],
+                    'Bajo Depósitos': summary['prob_below_deposits']
+                })
+                for column in ('Valor Final p5', 'Valor Final Mediano', 'Valor Final p95'):
+                    backtest_table[column] = backtest_table[column].map('${:,.2f}'.format)
+                backtest_table['Retorno Mediano (%)'] = backtest_table['Retorno Mediano (%)'].map('{:.2f}%'.format)
+                for column in ('Máximo Drawdown Mediano', 'Máximo Drawdown p95'):
+                    backtest_table[column] = backtest_table[column].map('-{:.2f}%'.format)
+                backtest_table['Bajo Depósitos'] = backtest_table['Bajo Depósitos'].map('{:.1%}'.format)
+                st.table(backtest_table)
+    
+    # Per-deposit lots: every contribution has its own lock expiry, fee crystallization and high-water mark
+    if st.checkbox("Modo Lotes (Ledger por Depósito)", value=False):
+        with timer.stage('lot_ledger') as stage:
+            ledger = RESULT_CACHE.get_or_compute(
+                ('simulator1.0', 'lots') + inputs,
+                lambda: compute(
+                    'lots',
+                    initial_capital=initial_capital,
+                    periodic_savings=periodic_savings,
+                    periods=periods,
+                    lock_period=lock_period,
+                    savings_frequency=savings_frequency,
+                    preset=PRESET,
+                    include_savings=include_savings
+                )
+            )
+            stage['payload'] = ledger
+        lot_scenario = st.selectbox(
+            "Escenario de Lotes",
+            options=list(SCENARIO_RATES),
+            index=1,
+            format_func=lambda x: SCENARIO_LABELS[x]
+        )
+        i = list(SCENARIO_RATES).index(lot_scenario)
+        start_date = full_results['dates'][0]
+        lot_dates = date_axis(start_date, ledger['deposits'].size, 'W')
         
-        fig.add_trace(go.Scatter(
-            x=results['dates'],
-            y=[-x for x in results['drawdown_opt']],
-            name="Drawdown Optimista",
-            line=dict(color='green', dash='dot')
-        ))
+        with timer.stage('lot_chart') as stage:
+            lot_chart = go.Figure()
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['liquid'][i],
+                x_range=x_range,
+                name="Saldo Líquido",
+                fill='tozeroy',
+                line=dict(color='green')
+            ))
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['liquid'][i] + ledger['locked'][i],
+                x_range=x_range,
+                name="Líquido + Bloqueado",
+                fill='tonexty',
+                line=dict(color='gray')
+            ))
+            lot_chart.add_trace(make_trace(
+                lot_dates,
+                ledger['deposits'],
+                x_range=x_range,
+                name="Depósitos acumulados",
+                line=dict(dash='dash', color='blue')
+            ))
+            lot_chart.update_layout(
+                title=f"Saldo Líquido vs. Bloqueado por Lotes ({SCENARIO_LABELS[lot_scenario]})",
+                xaxis_title="Fecha",
+                yaxis_title="Valor (USD)",
+                hovermode='x unified'
+            )
+            lot_chart.update_layout(
+                paper_bgcolor='#0E1117',
+                plot_bgcolor='#0E1117',
+                font=dict(color='white'),
+                xaxis=dict(gridcolor='#333333'),
+                yaxis=dict(gridcolor='#333333')
+            )
+            stage['payload'] = lot_chart
+        with timer.stage('render_lot_chart'):
+            st.plotly_chart(lot_chart, use_container_width=True)
+        
+        lot_summary = pd.DataFrame({
+            'Escenario': [SCENARIO_LABELS[name] for name in SCENARIO_RATES],
+            'Saldo Líquido': ledger['liquid'][:, -1],
+            'Saldo Bloqueado': ledger['locked'][:, -1],
+            'Comisiones Pagadas': ledger['fees_paid'][:, -1],
+            'Comisión Devengada': ledger['accrued_fee'].sum(axis=1),
+            'Valor Neto': ledger['net_value'].sum(axis=1)
+        })
+        for column in lot_summary.columns[1:]:
+            lot_summary[column] = lot_summary[column].map('${:,.2f}'.format)
+        st.table(lot_summary)
+        
+        lots = ledger['lots']
+        st.dataframe(pd.DataFrame({
+            'Entrada': start_date + 7 * lots['entry'].astype('timedelta64[D]'),
+            'Vencimiento': start_date + 7 * lots['expiry'].astype('timedelta64[D]'),
+            'Monto': lots['amount'],
+            'Marca de Agua': ledger['high_water'][i],
+            'Valor': ledger['value'][i],
+            'Comisión Pagada': ledger['fee_paid'][i],
+            'Comisión Devengada': ledger['accrued_fee'][i],
+            'Estado': np.where(ledger['is_locked'], 'Bloqueado', 'Líquido')
+        }), use_container_width=True, hide_index=True)
     
-    fig.update_layout(
-        title="Simulación de Flujos: Depósitos vs. Inversión",
-        xaxis_title="Fecha",
-        yaxis_title="Valor Acumulado (USD)",
-        hovermode='x unified',
-        height=600,
-        paper_bgcolor='#0E1117',
-        plot_bgcolor='#0E1117',
-        font=dict(color='white'),
-        xaxis=dict(gridcolor='#333333'),
-        yaxis=dict(gridcolor='#333333')
-    )
+    st.subheader("Resumen de Inversión")
     
-    st.plotly_chart(fig, use_container_width=True)
+    with timer.stage('summary_dataframe') as stage:
+        final_values = pd.DataFrame({
+            'Escenario': ['Depósitos', 'Pesimista', 'Moderado', 'Optimista'],
+            'Valor Final': results.values[:, -1],
+            'Retorno (%)': np.concatenate([[0], results.returns]),
+            'Comisión de Performance': ['0%'] + [f"{fee * 100}%" for fee in results.fees.tolist()],
+            'Máximo Drawdown': np.concatenate([[0], results.drawdowns['max_drawdown']]),
+            'Ratio Calmar': np.concatenate([[np.nan], results.drawdowns['calmar']])
+        })
+        
+        final_values['Valor Final'] = final_values['Valor Final'].map('${:,.2f}'.format)
+        final_values['Retorno (%)'] = final_values['Retorno (%)'].map('{:.2f}%'.format)
+        final_values['Máximo Drawdown'] = final_values['Máximo Drawdown'].map('-{:.2f}%'.format)
+        final_values['Ratio Calmar'] = final_values['Ratio Calmar'].map(
+            lambda x: f'{x:.2f}' if np.isfinite(x) else 'N/A'
+        )
+        stage['payload'] = final_values
+    
+    with timer.stage('render_table'):
+        st.table(final_values)
+    
+    # Tornado chart from the closed-form partial derivatives computed with the scenarios
+    with st.expander("Análisis de Sensibilidad"):
+        sens_scenario = st.selectbox(
+            "Escenario de Sensibilidad",
+            options=list(SCENARIO_RATES),
+            index=1,
+            format_func=lambda x: SCENARIO_LABELS[x]
+        )
+        i = list(SCENARIO_RATES).index(sens_scenario)
+        sensitivities = results['sensitivities']
+        input_values = np.array([
+            initial_capital,
+            periodic_savings,
+            SCENARIO_RATES[sens_scenario],
+            periods,
+            lock_period
+        ], dtype=float)
+        with timer.stage('tornado') as stage:
+            tornado = tornado_figure(
+                [SENSITIVITY_LABELS[name] for name in SENSITIVITY_INPUTS],
+                sensitivities['d_final_value'][i] * input_values * TORNADO_STEP,
+                title=f"Sensibilidad del Valor Final ({SCENARIO_LABELS[sens_scenario]}, ±{TORNADO_STEP:.0%})",
+                step_label=f"{TORNADO_STEP:.0%}"
+            )
+            tornado.update_layout(
+                paper_bgcolor='#0E1117',
+                plot_bgcolor='#0E1117',
+                font=dict(color='white')
+            )
+            stage['payload'] = tornado
+        st.plotly_chart(tornado, use_container_width=True)
+        st.table(pd.DataFrame({
+            'Variable': [SENSITIVITY_LABELS[name] for name in SENSITIVITY_INPUTS],
+            'Δ Valor Final por Unidad': [f"{x:,.4f}" for x in sensitivities['d_final_value'][i]],
+            'Δ Retorno Neto (pp) por Unidad': [f"{x:,.6f}" for x in sensitivities['d_net_return_pct'][i]]
+        }))
+    
+    # Goal seek: the input each scenario needs to reach a target value net of fees, the others fixed
+    with st.expander("Meta de Inversión"):
+        target_value = st.number_input("Valor Objetivo Neto (USD)", min_value=0.0, value=100000.0, step=1000.0)
+        solve_for = st.selectbox(
+            "Calcular",
+            options=SOLVABLE,
+            format_func=lambda x: SENSITIVITY_LABELS[x]
+        )
+        with timer.stage('goal_seek') as stage:
+            goal = RESULT_CACHE.get_or_compute(
+                ('simulator1.0', 'goal_seek', target_value, solve_for) + inputs,
+                lambda: solve_goal(
+                    target_value,
+                    solve_for,
+                    initial_capital=initial_capital,
+                    periodic_savings=periodic_savings if include_savings else 0,
+                    periods=periods,
+                    lock_period=lock_period,
+                    savings_frequency=savings_frequency,
+                    annual_rate=np.array(list(SCENARIO_RATES.values())),
+                    lock_delays_returns=SCENARIO_PRESETS[PRESET]['lock_delays_returns'],
+                    fee_schedule=SCENARIO_PRESETS[PRESET]['fee_schedule']
+                )
+            )
+            stage['payload'] = goal
+        value_format = {
+            'periodic_savings': '${:,.2f}'.format,
+            'initial_capital': '${:,.2f}'.format,
+            'periods': lambda x: f"{x:.0f} ({savings_frequency})",
+            'annual_rate': '{:.2%}'.format
+        }[solve_for]
+        # The required rate is the same for every scenario; the other inputs depend on its rate
+        rows = slice(0, 1) if solve_for == 'annual_rate' else slice(None)
+        scenario_names = ['Todos'] if solve_for == 'annual_rate' else [SCENARIO_LABELS[name] for name in SCENARIO_RATES]
+        st.table(pd.DataFrame({
+            'Escenario': scenario_names,
+            SENSITIVITY_LABELS[solve_for]: [
+                value_format(x) if np.isfinite(x) else 'Inalcanzable' for x in goal['value'][rows]
+            ],
+            'Depósitos': [f"${x:,.2f}" if np.isfinite(x) else '-' for x in goal['deposits'][rows]],
+            'Valor Final Neto': [f"${x:,.2f}" if np.isfinite(x) else '-' for x in goal['net_final_value'][rows]]
+        }))
+    
+    # Sensitivity heatmap over capital x savings for the selected horizon and lock period
+    with st.expander("Mapa de Sensibilidad"):
+        capital_axis = np.linspace(1000, max(initial_capital * 2, 10000), 25)
+        savings_axis = np.linspace(0, max(periodic_savings * 2, 500), 25)
+        with timer.stage('sensitivity_grid') as stage:
+            grid = evaluate_grid(
+                capital_axis,
+                savings_axis,
+                periods,
+                lock_period,
+                savings_frequency,
+                SCENARIO_RATES['moderate']
+            )
+            stage['payload'] = grid
+        heatmap = go.Figure(go.Heatmap(
+            x=savings_axis,
+            y=capital_axis,
+            z=grid['final_value'][0, :, :, 0, 0, 0],
+            colorbar=dict(title="USD")
+        ))
+        heatmap.update_layout(
+            title="Valor Final (Escenario Moderado)",
+            xaxis_title=f"Ahorro {savings_frequency} (USD)",
+            yaxis_title="Capital Inicial (USD)",
+            paper_bgcolor='#0E1117',
+            plot_bgcolor='#0E1117',
+            font=dict(color='white')
+        )
+        st.plotly_chart(heatmap, use_container_width=True)
     
-    st.subheader("Resumen de Inversión")
+    # Historical crisis table (data/crisis_events.csv) stress-tested against every week of the horizon
+    st.subheader("Rendimiento Histórico en Crisis")
+    with timer.stage('stress_test') as stage:
+        stress = RESULT_CACHE.get_or_compute(
+            ('simulator1.0', 'stress') + inputs,
+            lambda: stress_results(
+                initial_capital,
+                periodic_savings,
+                periods,
+                lock_period,
+                savings_frequency,
+                preset=PRESET,
+                include_savings=include_savings
+            )
+        )
+        stage['payload'] = stress
     
-    final_values = pd.DataFrame({
-        'Escenario': ['Depósitos', 'Pesimista', 'Moderado', 'Optimista'],
-        'Valor Final': [
-            results['savings'][-1],
-            results['pessimistic'][-1],
-            results['moderate'][-1],
-            results['optimistic'][-1]
-        ],
-        'Retorno (%)': [
-            0,
-            results['returns']['pessimistic'],
-            results['returns']['moderate'],
-            results['returns']['optimistic']
-        ],
-        'Comisión de Performance': [
-            '0%',
-            f"{results['fees']['pessimistic']*100}%",
-            f"{results['fees']['moderate']*100}%",
-            f"{results['fees']['optimistic']*100}%"
+    crisis_table = pd.DataFrame({
+        'Período': stress['period'],
+        'Evento': stress['event'],
+        'S&P 500': [f"{x:+.2f}%" for x in stress['sp500_return_pct']],
+        'StreakBull MS': [f"{x:+.2f}%" for x in stress['strategy_return_pct']]
+    })
+    for i, name in enumerate(stress['scenarios']):
+        crisis_table[f'Peor Valor Final ({SCENARIO_LABELS[name]})'] = [
+            f"${x:,.2f}" for x in stress['worst_final_value'][i]
         ]
+    st.table(crisis_table)
+    
+    # Worst event and injection week per scenario
+    worst_event = stress['worst_final_value'].argmin(axis=1)
+    rows = np.arange(len(stress['scenarios']))
+    stress_summary = pd.DataFrame({
+        'Escenario': [SCENARIO_LABELS[name] for name in stress['scenarios']],
+        'Valor Final Base': [f"${x:,.2f}" for x in stress['baseline_final_value']],
+        'Peor Valor Final': [f"${x:,.2f}" for x in stress['worst_final_value'][rows, worst_event]],
+        'Peor Evento': stress['event'][worst_event],
+        'Semana de Inicio': stress['worst_week'][rows, worst_event],
+        'Peor Drawdown': [f"-{x:.2f}%" for x in stress['worst_drawdown'].max(axis=1)]
     })
-    
-    final_values['Valor Final'] = final_values['Valor Final'].map('${:,.2f}'.format)
-    final_values['Retorno (%)'] = final_values['Retorno (%)'].map('{:.2f}%'.format)
-    
-    st.table(final_values)
-    
-    # Add historical crisis performance table
-    st.subheader("Rendimiento Histórico en Crisis")
-    crisis_data = {
-        'Período': ['2008 Q1', '2008 Q3', '2015 Q3', '2018 Q4', '2020 Q1', '2022 Q1-Q3'],
-        'Evento': ['Crisis Hipotecaria', 'Crisis de Deuda', 'Crisis Griega', 'Guerra Comercial', 'COVID-19', 'Rusia/Inflación US'],
-        'S&P 500': ['-9.45%', '-8.37%', '-6.44%', '-14.31%', '-20.1%', '-23.1%'],
-        'StreakBull MS': ['+0.68%', '+0.92%', '-0.2%', '-0.12%', '-1.50%', '-2.8%']
-    }
-    st.table(pd.DataFrame(crisis_data))
+    st.table(stress_summary)
     
     # Export results button
+    export_formats = ['Excel', 'CSV'] + (['Parquet'] if parquet_available() else [])
+    file_format = st.selectbox("Formato de Exportación", options=export_formats)
     if st.button('Exportar Resultados'):
-        excel_data = export_to_excel(results)
-        b64 = base64.b64encode(excel_data).decode()
-        href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="simulacion_streakbull.xlsx">Descargar Excel</a>'
-        st.markdown(href, unsafe_allow_html=True)
+        # Written to a temporary file chunk by chunk; st.download_button has no streaming
+        # API, so the finished file is still read into memory once to be served
+        with timer.stage('export') as stage:
+            path = export_to_file(export_sheets(results), file_format)
+            stage['payload_bytes'] = os.path.getsize(path)
+        extension, mime = EXPORT_FORMATS[file_format]
+        try:
+            with open(path, 'rb') as f:
+                st.download_button(
+                    f"Descargar {file_format}",
+                    data=f,
+                    file_name=f"simulacion_streakbull.{extension}",
+                    mime=mime
+                )
+        finally:
+            os.remove(path)
+    
+    # Process-wide cache counters
+    with st.expander("Estadísticas de Caché"):
+        st.json(RESULT_CACHE.stats())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,139 @@
+"""Crisis stress tests: historical shocks injected at every week of a projected horizon.
+
+Each event in data/crisis_events.csv lasts ``weeks`` weeks and has a total
+return for the S&P 500 and for the StreakBull strategy. The shock spreads
+that return evenly over its weeks and replaces the scenario's own weekly
+growth while it lasts. Every event is injected at every week of the horizon
+for every rate scenario at once, in closed form over prefix sums of the
+baseline path, so no path is ever materialized.
+"""
+import csv
+import os
+
+import numpy as np
+
+from scenario_engine import SCENARIO_PRESETS, weekly_rates, to_weeks, lock_weeks
+
+CRISIS_EVENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crisis_events.csv')
+
+# Event return column and leverage applied to each scenario (1X QQQ, 1X and 2X StreakBull)
+STRESS_SERIES = {
+    'pessimistic': ('sp500_return_pct', 1),
+    'moderate': ('strategy_return_pct', 1),
+    'optimistic': ('strategy_return_pct', 2)
+}
+
+
+def load_crisis_events(path=CRISIS_EVENTS_PATH):
+    """Load the event table as column arrays"""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return {
+        'period': np.array([row['period'] for row in rows]),
+        'event': np.array([row['event'] for row in rows]),
+        'weeks': np.array([int(row['weeks']) for row in rows]),
+        'sp500_return_pct': np.array([float(row['sp500_return_pct']) for row in rows]),
+        'strategy_return_pct': np.array([float(row['strategy_return_pct']) for row in rows])
+    }
+
+
+CRISIS_EVENTS = load_crisis_events()
+
+
+def shock_log_returns(events, series):
+    """Weekly log return of every event per (column, leverage) pair; shape (len(series), events)"""
+    weekly = np.array([
+        (1 + events[column] / 100) ** (1 / events['weeks']) - 1 for column, _ in series
+    ])
+    leverage = np.array([lev for _, lev in series], dtype=float)[:, None]
+    return np.log1p(leverage * weekly)
+
+
+def _geometric(log_rate, n):
+    """sum(exp(-j * log_rate) for j in 1..n), elementwise"""
+    log_rate, n = np.broadcast_arrays(log_rate, n)
+    return np.divide(
+        np.exp(-log_rate) * np.expm1(-n * log_rate),
+        np.expm1(-log_rate),
+        out=n.astype(float),
+        where=log_rate != 0
+    )
+
+
+def stress_test(initial_capital, savings_weekly, weeks, annual_rates, series, lock_weeks=0, events=CRISIS_EVENTS):
+    """Final value and drawdown of every (rate, event, injection week) at once.
+
+    Follows simulate_paths: week 0 holds the initial capital, and each week
+    grows the balance by that week's factor before adding the savings. An
+    event injected at week k replaces the growth of weeks k+1 .. k+duration,
+    cut at the horizon. With non-negative rates and savings the unshocked
+    path never falls and the shocked stretch is monotone, so the maximum
+    drawdown runs from week k to the end of the shock.
+
+    ``series`` holds one (event column, leverage) pair per rate. Returns
+    'final_value' and 'max_drawdown' (%) of shape (rates, events, weeks - 1),
+    the unshocked 'baseline_final_value' per rate, and per (rate, event) the
+    'worst_final_value', its injection 'worst_week' and the 'worst_drawdown'.
+    """
+    if weeks < 2:
+        raise ValueError("stress tests need a horizon of at least 2 weeks")
+    rates = weekly_rates(np.atleast_1d(annual_rates))[:, None]
+    t = np.arange(weeks)
+
+    # Baseline log growth B and discounted-savings prefix sums D; week 0 never compounds
+    compounding = t >= max(int(lock_weeks), 1)
+    log_growth = np.cumsum(np.log1p(rates) * compounding, axis=1)
+    discount = np.cumsum(np.exp(-log_growth) * (t > 0), axis=1)
+
+    shock = shock_log_returns(events, series)[:, :, None]
+    k = t[None, None, :-1]
+    end = np.minimum(k + events['weeks'][None, :, None], weeks - 1)
+    n = end - k
+
+    def at(prefix, index):
+        return np.take_along_axis(prefix[:, None, :], np.broadcast_to(index, shock.shape[:2] + (weeks - 1,)), axis=2)
+
+    b_k, b_end, b_last = at(log_growth, k), at(log_growth, end), log_growth[:, -1, None, None]
+    d_k, d_end, d_last = at(discount, k), at(discount, end), discount[:, -1, None, None]
+
+    shocked = np.exp(-b_k) * _geometric(shock, n)
+    value_k = np.exp(b_k) * (initial_capital + savings_weekly * d_k)
+    value_end = np.exp(b_k + n * shock) * (initial_capital + savings_weekly * (d_k + shocked))
+    final_value = np.exp(b_last - b_end + b_k + n * shock) * (
+        initial_capital
+        + savings_weekly * (d_k + shocked + np.exp(b_end - b_k - n * shock) * (d_last - d_end))
+    )
+    max_drawdown = np.maximum(1 - value_end / value_k, 0) * 100
+
+    worst_week = final_value.argmin(axis=2)
+    return {
+        'final_value': final_value,
+        'max_drawdown': max_drawdown,
+        'baseline_final_value': np.exp(log_growth[:, -1]) * (initial_capital + savings_weekly * discount[:, -1]),
+        'worst_final_value': final_value.min(axis=2),
+        'worst_week': worst_week,
+        'worst_drawdown': max_drawdown.max(axis=2)
+    }
+
+
+def stress_results(initial_capital, periodic_savings, periods, lock_period, savings_frequency,
+                   preset='streakbull', include_savings=True, events=CRISIS_EVENTS):
+    """Stress test of every scenario of a preset against every crisis event.
+
+    Takes the same inputs as scenario_results. Returns stress_test's arrays
+    plus the 'scenarios' names and the event table columns.
+    """
+    config = SCENARIO_PRESETS[preset]
+    weeks, savings_weekly = to_weeks(periods, periodic_savings if include_savings else 0, savings_frequency)
+    results = stress_test(
+        initial_capital,
+        savings_weekly,
+        weeks,
+        list(config['rates'].values()),
+        [STRESS_SERIES[name] for name in config['rates']],
+        lock_weeks(lock_period) if config['lock_delays_returns'] else 0,
+        events
+    )
+    results['scenarios'] = list(config['rates'])
+    results.update(events)
+    return results